@@ -8,6 +8,7 @@ import json
 import logging
 import traceback
 import base64
+import struct
 import tempfile
 from pathlib import Path
 
@@ -19,6 +20,12 @@ from services.audio_separator import AudioSeparator
 from services.speech_recognizer import SpeechRecognizer
 from services.voice_composer import VoiceComposer
 
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
 # 配置日志 - 使用正确的相对路径
 log_dir = Path('../logs')
 log_dir.mkdir(exist_ok=True)
@@ -33,6 +40,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 长度前缀分帧：4字节小端无符号长度 + 消息体
+FRAME_HEADER = struct.Struct('<I')
+
+def read_frame(stream):
+    """从二进制流读取一帧，流结束时返回None"""
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        return None
+    return payload
+
+def write_frame(stream, payload):
+    """向二进制流写入一帧并立即刷新"""
+    stream.write(FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
 class IPCHandler:
     """IPC命令处理器"""
     
@@ -293,46 +320,78 @@ class IPCHandler:
         }
 
 # 主处理函数
-async def main():
-    """主函数 - 处理来自stdin的IPC命令"""
+async def main(framed=False, use_msgpack=False):
+    """
+    主函数 - 处理来自stdin的IPC命令
+    
+    默认每行一条JSON消息（Electron 前端使用）；framed 为 True 时改用长度前缀分帧，
+    按长度直接读取消息体，无需逐字节查找换行；use_msgpack 为 True 时分帧消息体改用
+    msgpack 二进制编码（隐含分帧）
+    """
+    if use_msgpack:
+        if not MSGPACK_AVAILABLE:
+            logger.error("msgpack 未安装，无法使用 msgpack 编码")
+            return
+        framed = True
+        codec = "msgpack"
+        decode = lambda raw: msgpack.unpackb(raw, raw=False)
+        encode = lambda obj: msgpack.packb(obj, use_bin_type=True)
+    else:
+        codec = "JSON"
+        decode = json.loads
+        encode = lambda obj: json.dumps(obj).encode('utf-8')
+    
     handler = IPCHandler()
     
-    logger.info("IPC处理器启动，等待命令...")
+    def send(response):
+        if framed:
+            write_frame(sys.stdout.buffer, encode(response))
+        else:
+            print(json.dumps(response), flush=True)
+    
+    logger.info(f"IPC处理器启动（{'分帧' if framed else '行'}模式，{codec}编码），等待命令...")
     
     try:
         while True:
             # 从stdin读取命令
-            line = sys.stdin.readline().strip()
-            if not line:
-                continue
+            if framed:
+                line = read_frame(sys.stdin.buffer)
+                if line is None:
+                    break
+            else:
+                line = sys.stdin.readline().strip()
+                if not line:
+                    continue
                 
             try:
-                # 解析JSON命令
-                data = json.loads(line)
-                command = data.get('command')
-                params = data.get('params', {})
-                request_id = data.get('id')
-                
-                # 处理命令
-                result = await handler.handle_command(command, params)
-                
-                # 返回结果
-                response = {
-                    "id": request_id,
-                    "result": result
-                }
-                
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError as e:
+                # 解析命令（只有解码放在这里，命令执行中的错误由 handle_command 按正常路径返回）
+                data = decode(line)
+            except ValueError as e:
+                # json.JSONDecodeError 与 msgpack 的解包错误均为 ValueError 子类
                 error_response = {
                     "id": None,
                     "result": {
                         "success": False,
-                        "error": f"JSON解析错误: {e}"
+                        "error": f"{codec}解析错误: {e}"
                     }
                 }
-                print(json.dumps(error_response), flush=True)
+                send(error_response)
+                continue
+            
+            command = data.get('command')
+            params = data.get('params', {})
+            request_id = data.get('id')
+            
+            # 处理命令
+            result = await handler.handle_command(command, params)
+            
+            # 返回结果
+            response = {
+                "id": request_id,
+                "result": result
+            }
+            
+            send(response)
                 
     except KeyboardInterrupt:
         logger.info("IPC处理器停止")
@@ -342,4 +401,7 @@ async def main():
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
+    asyncio.run(main(
+        framed='--framed' in sys.argv[1:],
+        use_msgpack='--msgpack' in sys.argv[1:]
+    ))
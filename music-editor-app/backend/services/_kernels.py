@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+音色处理数值内核
+Numba 可用时编译为机器码，否则退回等价的 numpy 实现
+
+二维混合内核只在 OpenMP 线程层可用时启用 parallel: 内核都在线程池的工作线程中调用，
+Numba 默认的 TBB 线程层在非主线程首次启动后会导致解释器退出时挂起，
+workqueue 线程层又不允许多个线程并发调用；OpenMP 不可用时按单线程编译
+"""
+
+import os
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+PARALLEL_KERNELS = False
+if NUMBA_AVAILABLE:
+    if os.environ.get('NUMBA_THREADING_LAYER'):
+        # 用户显式指定了线程层，按其设置启用 parallel
+        PARALLEL_KERNELS = True
+    else:
+        try:
+            from numba.np.ufunc import omppool  # noqa: F401  仅检查 OpenMP 线程层能否加载
+            numba.config.THREADING_LAYER = 'omp'
+            PARALLEL_KERNELS = True
+        except ImportError:
+            PARALLEL_KERNELS = False
+
+if NUMBA_AVAILABLE:
+    
+    @njit(parallel=PARALLEL_KERNELS, fastmath=True)
+    def _blend_log_envelope(src, tgt, s, out):
+        """对数域混合频谱包络: out = exp((1-s)*log(tgt) + s*log(src))"""
+        for i in prange(out.shape[0]):
+            for j in range(out.shape[1]):
+                out[i, j] = np.exp(
+                    (1 - s) * np.log(tgt[i, j] + 1e-10) + s * np.log(src[i, j] + 1e-10)
+                )
+        return out
+    
+    @njit(parallel=PARALLEL_KERNELS, fastmath=True)
+    def _blend_linear_clip(src, tgt, s, lo, hi, out):
+        """线性混合并限幅: out = clip((1-s)*tgt + s*src, lo, hi)"""
+        for i in prange(out.shape[0]):
+            for j in range(out.shape[1]):
+                value = (1 - s) * tgt[i, j] + s * src[i, j]
+                out[i, j] = min(max(value, lo), hi)
+        return out
+    
+    @njit(parallel=PARALLEL_KERNELS, fastmath=True)
+    def _apply_freq_weight(mag, w, out):
+        """按频点加权: out[i, :] = mag[i, :] * w[i]（out 可与 mag 为同一数组）"""
+        for i in prange(mag.shape[0]):
+            weight = w[i]
+            for j in range(mag.shape[1]):
+                out[i, j] = mag[i, j] * weight
+        return out
+    
+    # 一维流式内核受内存带宽限制，不启用 parallel（多线程收益很小，且会在工作线程上首次启动线程池）
+    @njit(fastmath=True)
+    def _compress_kernel(x, threshold, ratio, out):
+        """单遍动态范围压缩: |x| 超过阈值的部分按 ratio 压缩，保持符号"""
+        for i in range(x.size):
+            a = abs(x[i])
+            if a > threshold:
+                s = 1.0 if x[i] >= 0 else -1.0
+                out[i] = s * (threshold + (a - threshold) / ratio)
+            else:
+                out[i] = x[i]
+        return out
+    
+    @njit(fastmath=True)
+    def _audio_stats(x):
+        """单遍统计: 返回 (总和, 平方和, 最小值, 最大值)，累加使用 float64"""
+        total = 0.0
+        total_sq = 0.0
+        lo = np.inf
+        hi = -np.inf
+        for i in range(x.size):
+            v = x[i]
+            total += v
+            total_sq += v * v
+            lo = min(lo, v)
+            hi = max(hi, v)
+        return total, total_sq, lo, hi
+    
+    @njit(fastmath=True)
+    def _offset_scale(x, offset, scale, out):
+        """单遍平移缩放: out = (x - offset) * scale"""
+        for i in range(x.size):
+            out[i] = (x[i] - offset) * scale
+        return out
+        
+else:
+    
+    def _blend_log_envelope(src, tgt, s, out):
+        """对数域混合频谱包络: out = exp((1-s)*log(tgt) + s*log(src))"""
+        np.log(tgt + 1e-10, out=out)
+        out *= 1 - s
+        out += s * np.log(src + 1e-10)
+        return np.exp(out, out=out)
+    
+    def _blend_linear_clip(src, tgt, s, lo, hi, out):
+        """线性混合并限幅: out = clip((1-s)*tgt + s*src, lo, hi)"""
+        np.multiply(tgt, 1 - s, out=out)
+        out += s * src
+        return np.clip(out, lo, hi, out=out)
+    
+    def _apply_freq_weight(mag, w, out):
+        """按频点加权: out[i, :] = mag[i, :] * w[i]（out 可与 mag 为同一数组）"""
+        return np.multiply(mag, w[:, None], out=out)
+    
+    def _compress_kernel(x, threshold, ratio, out):
+        """单遍动态范围压缩: |x| 超过阈值的部分按 ratio 压缩，保持符号"""
+        # 无分支写法: x - sign(x) * max(|x| - t, 0) * (1 - 1/ratio)，全部在 out 中原地完成
+        np.abs(x, out=out)
+        out -= threshold
+        np.maximum(out, 0, out=out)
+        out *= 1 - 1 / ratio
+        np.copysign(out, x, out=out)
+        return np.subtract(x, out, out=out)
+    
+    def _audio_stats(x):
+        """单遍统计: 返回 (总和, 平方和, 最小值, 最大值)，累加使用 float64"""
+        if x.size == 0:
+            return 0.0, 0.0, np.inf, -np.inf
+        x64 = np.asarray(x, dtype=np.float64)
+        return float(np.sum(x64)), float(np.dot(x64, x64)), float(np.min(x)), float(np.max(x))
+    
+    def _offset_scale(x, offset, scale, out):
+        """单遍平移缩放: out = (x - offset) * scale"""
+        np.subtract(x, offset, out=out)
+        out *= scale
+        return out
+
+__all__ = [
+    'NUMBA_AVAILABLE',
+    'PARALLEL_KERNELS',
+    '_blend_log_envelope',
+    '_blend_linear_clip',
+    '_apply_freq_weight',
+    '_compress_kernel',
+    '_audio_stats',
+    '_offset_scale'
+]
@@ -312,13 +312,12 @@ class AudioSeparator:
             low_freq_content = (left + right) / 2
             
             # 高通滤波器保留低频
-            from scipy.signal import butter, filtfilt
-            b, a = butter(2, 200, btype='high', fs=44100)
-            enhanced_side = filtfilt(b, a, enhanced_side)
+            sos = signal.butter(2, 200, btype='high', fs=44100, output='sos')
+            enhanced_side = signal.sosfiltfilt(sos, enhanced_side)
             
             # 低通滤波器提取低频
-            b, a = butter(2, 200, btype='low', fs=44100)
-            low_freq = filtfilt(b, a, low_freq_content)
+            sos = signal.butter(2, 200, btype='low', fs=44100, output='sos')
+            low_freq = signal.sosfiltfilt(sos, low_freq_content)
             
             # 合并
             accompaniment = enhanced_side + low_freq * 0.5
@@ -637,9 +636,8 @@ class AudioSeparator:
             # 2. 仅当检测到显著噪声时才处理
             if noise_level > 0.001:  # 最小噪声阈值
                 # 温和的高通滤波，去除低频噪音
-                from scipy.signal import butter, filtfilt
-                b, a = butter(2, 40.0 / (sr/2), btype='high')  # 40Hz高通
-                audio = filtfilt(b, a, audio)
+                sos = signal.butter(2, 40.0 / (sr/2), btype='high', output='sos')  # 40Hz高通
+                audio = signal.sosfiltfilt(sos, audio)
                 
                 # 轻微的噪声门限
                 gate_threshold = noise_level * 2
@@ -682,11 +680,10 @@ class AudioSeparator:
             if low >= high:
                 return audio
             
-            from scipy.signal import butter, filtfilt
-            b, a = butter(2, [low, high], btype='band')
+            sos = signal.butter(2, [low, high], btype='band', output='sos')
             
             # 提取目标频段
-            filtered = filtfilt(b, a, audio)
+            filtered = signal.sosfiltfilt(sos, audio)
             
             # 温和衰减
             return audio - (1 - attenuation) * filtered
@@ -765,16 +762,16 @@ class AudioSeparator:
             low = max(0.001, min(low, 0.99))
             high = max(low + 0.001, min(high, 0.99))
             
-            b, a = signal.butter(4, [low, high], btype='band')
+            sos = signal.butter(4, [low, high], btype='band', output='sos')
             
             # 应用滤波器到每个声道
             if audio.ndim == 1:
-                filtered = signal.filtfilt(b, a, audio)
+                filtered = signal.sosfiltfilt(sos, audio)
                 return audio + (gain - 1) * filtered
             else:
                 result = np.copy(audio)
                 for ch in range(audio.shape[1]):
-                    filtered = signal.filtfilt(b, a, audio[:, ch])
+                    filtered = signal.sosfiltfilt(sos, audio[:, ch])
                     result[:, ch] = audio[:, ch] + (gain - 1) * filtered
                 return result
                 
@@ -841,14 +838,12 @@ class AudioSeparator:
             
             # 简单的中央声道分离
             # 人声通常在中央，伴奏在左右声道
-            left = y[0]
-            right = y[1]
-            
-            # 人声 = 中央声道 (L+R)/2
-            vocals = (left + right) / 2
-            
-            # 伴奏 = 侧声道 (L-R)/2  
-            accompaniment = (left - right) / 2
+            # 人声 = 中央声道 (L+R)/2, 伴奏 = 侧声道 (L-R)/2
+            # 用一次矩阵乘法同时得到两者，只遍历一次左右声道
+            mix = np.array([[0.5, 0.5], [0.5, -0.5]], dtype=y.dtype)
+            mid_side = mix @ y[:2]
+            vocals = mid_side[0]
+            accompaniment = mid_side[1]
             
             # 生成输出文件名
             input_filename = Path(audio_path).stem
@@ -858,9 +853,12 @@ class AudioSeparator:
             vocals_path = self.output_dir / vocals_filename
             accompaniment_path = self.output_dir / accompaniment_filename
             
-            # 保存文件
-            sf.write(str(vocals_path), vocals, sr)
-            sf.write(str(accompaniment_path), accompaniment, sr)
+            # 并行保存文件 (libsndfile 写入时释放 GIL)，显式指定 PCM_16 避免格式推断
+            loop = asyncio.get_event_loop()
+            await asyncio.gather(
+                loop.run_in_executor(None, sf.write, str(vocals_path), vocals, sr, 'PCM_16'),
+                loop.run_in_executor(None, sf.write, str(accompaniment_path), accompaniment, sr, 'PCM_16')
+            )
             
             duration = len(vocals) / sr
             
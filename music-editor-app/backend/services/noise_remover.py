@@ -3,6 +3,7 @@
 专门处理音频分离后的白噪音和其他噪音问题
 """
 
+import asyncio
 import numpy as np
 import librosa
 import soundfile as sf
@@ -19,6 +20,16 @@ class NoiseRemover:
     def __init__(self):
         self.output_dir = Path("uploads/cleaned")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 平滑低通滤波器 (截止频率固定为 40% 采样率，即 0.8 倍奈奎斯特频率)
+        self._smooth_sos = signal.butter(2, 0.8, btype='low', output='sos')
+        self._smooth_zi = signal.sosfilt_zi(self._smooth_sos)
+        
+        # 噪音类型检测的频段掩码缓存，键为 (采样率, 频率点数)
+        self._band_mask_cache = {}
+        
+        # 陷波滤波器 SOS 缓存，键为 (采样率, 频率, Q因子)
+        self._notch_sos_cache = {}
     
     async def remove_noise(self, audio_path: str, noise_type: str = "auto", strength: float = 0.8) -> dict:
         """
@@ -35,15 +46,20 @@ class NoiseRemover:
         try:
             logger.info(f"开始降噪处理: {audio_path}, 类型: {noise_type}, 强度: {strength}")
             
+            # CPU/IO 密集的部分放到线程池，避免阻塞事件循环
+            loop = asyncio.get_event_loop()
+            
             # 加载音频
-            y, sr = librosa.load(audio_path, sr=None, mono=False)
+            y, sr = await loop.run_in_executor(None, self._load_audio, audio_path)
             
             if y.ndim == 1:
                 # 单声道处理
-                cleaned = self._process_mono_noise_removal(y, sr, noise_type, strength)
+                cleaned = await loop.run_in_executor(
+                    None, self._process_mono_noise_removal, y, sr, noise_type, strength
+                )
             else:
                 # 立体声处理
-                cleaned = self._process_stereo_noise_removal(y, sr, noise_type, strength)
+                cleaned = await self._process_stereo_noise_removal(y, sr, noise_type, strength)
             
             # 生成输出文件名
             input_filename = Path(audio_path).stem
@@ -51,10 +67,12 @@ class NoiseRemover:
             cleaned_path = self.output_dir / cleaned_filename
             
             # 保存清理后的音频
-            sf.write(str(cleaned_path), cleaned, sr)
+            await loop.run_in_executor(None, sf.write, str(cleaned_path), cleaned, sr)
             
             # 计算噪音减少量
-            noise_reduction = self._calculate_noise_reduction(y, cleaned)
+            noise_reduction = await loop.run_in_executor(
+                None, self._calculate_noise_reduction, y, cleaned
+            )
             
             logger.info(f"降噪完成: {cleaned_path}, 噪音减少: {noise_reduction:.1f}dB")
             
@@ -71,6 +89,10 @@ class NoiseRemover:
             logger.error(f"降噪处理失败: {e}")
             return {"success": False, "error": str(e)}
     
+    def _load_audio(self, audio_path: str):
+        """加载音频，保留原始采样率和声道"""
+        return librosa.load(audio_path, sr=None, mono=False)
+    
     def _process_mono_noise_removal(self, audio: np.ndarray, sr: int, noise_type: str, strength: float) -> np.ndarray:
         """处理单声道音频降噪"""
         try:
@@ -99,18 +121,31 @@ class NoiseRemover:
             logger.warning(f"单声道降噪失败: {e}, 返回原音频")
             return audio
     
-    def _process_stereo_noise_removal(self, audio: np.ndarray, sr: int, noise_type: str, strength: float) -> np.ndarray:
+    async def _process_stereo_noise_removal(self, audio: np.ndarray, sr: int, noise_type: str, strength: float) -> np.ndarray:
         """处理立体声音频降噪"""
         try:
             if audio.shape[0] == 2:
                 audio = audio.T  # 转置为 (samples, channels)
             
-            # 分别处理左右声道
-            left_cleaned = self._process_mono_noise_removal(audio[:, 0], sr, noise_type, strength)
-            right_cleaned = self._process_mono_noise_removal(audio[:, 1], sr, noise_type, strength)
+            # 左右声道相互独立，在线程池中并行处理 (scipy/numpy 计算会释放 GIL)
+            loop = asyncio.get_event_loop()
+            left_cleaned, right_cleaned = await asyncio.gather(
+                loop.run_in_executor(
+                    None,
+                    self._process_mono_noise_removal,
+                    np.ascontiguousarray(audio[:, 0]), sr, noise_type, strength
+                ),
+                loop.run_in_executor(
+                    None,
+                    self._process_mono_noise_removal,
+                    np.ascontiguousarray(audio[:, 1]), sr, noise_type, strength
+                )
+            )
             
-            # 合并声道
-            cleaned = np.column_stack([left_cleaned, right_cleaned])
+            # 合并声道 (直接写入预分配数组，保持输入精度，避免 column_stack 的 float64 副本)
+            cleaned = np.empty((len(left_cleaned), 2), dtype=audio.dtype)
+            cleaned[:, 0] = left_cleaned
+            cleaned[:, 1] = right_cleaned
             
             # 立体声相关性增强 (减少声道间的噪音差异)
             cleaned = self._enhance_stereo_coherence(cleaned, strength * 0.3)
@@ -124,19 +159,19 @@ class NoiseRemover:
     def _detect_noise_type(self, audio: np.ndarray, sr: int) -> str:
         """自动检测噪音类型"""
         try:
-            # 计算频谱
-            freqs, times, stft = signal.stft(audio, sr, nperseg=2048)
-            power_spectrum = np.abs(stft) ** 2
-            avg_power = np.mean(power_spectrum, axis=1)
+            # 计算平均功率谱 (welch 直接给出时间平均，中值平均对瞬态更稳健)
+            freqs, avg_power = signal.welch(audio, sr, nperseg=2048, average='median')
             
             # 分析频谱特征
             # 白噪音: 频谱相对平坦
             # 嘶嘶声: 高频能量较高
             # 嗡嗡声: 低频有峰值
             
-            low_freq_power = np.mean(avg_power[freqs < 200])  # <200Hz
-            mid_freq_power = np.mean(avg_power[(freqs >= 200) & (freqs < 2000)])  # 200Hz-2kHz
-            high_freq_power = np.mean(avg_power[freqs >= 2000])  # >2kHz
+            low_mask, mid_mask, high_mask = self._get_band_masks(freqs, sr)
+            
+            low_freq_power = avg_power[low_mask].mean()  # <200Hz
+            mid_freq_power = avg_power[mid_mask].mean()  # 200Hz-2kHz
+            high_freq_power = avg_power[high_mask].mean()  # >2kHz
             
             total_power = low_freq_power + mid_freq_power + high_freq_power
             
@@ -157,6 +192,19 @@ class NoiseRemover:
             logger.warning(f"噪音类型检测失败: {e}, 使用通用降噪")
             return "white"
     
+    def _get_band_masks(self, freqs: np.ndarray, sr: int):
+        """获取低/中/高频段掩码 (频率轴只取决于采样率和分段长度，可复用)"""
+        key = (sr, len(freqs))
+        masks = self._band_mask_cache.get(key)
+        if masks is None:
+            masks = (
+                freqs < 200,
+                (freqs >= 200) & (freqs < 2000),
+                freqs >= 2000
+            )
+            self._band_mask_cache[key] = masks
+        return masks
+    
     def _remove_white_noise(self, audio: np.ndarray, sr: int, strength: float) -> np.ndarray:
         """移除白噪音"""
         try:
@@ -264,25 +312,22 @@ class NoiseRemover:
         """维纳滤波降噪"""
         try:
             # 简化的维纳滤波实现
-            # 计算功率谱密度
-            freqs, psd = signal.welch(audio, sr, nperseg=2048)
+            # 直接在 rFFT 频点上估计功率谱，省去 welch 和增益插值
+            n_fast = fft.next_fast_len(len(audio), real=True)
+            audio_fft = fft.rfft(audio, n=n_fast, workers=-1)
+            power = audio_fft.real * audio_fft.real + audio_fft.imag * audio_fft.imag
             
             # 估计信噪比
-            noise_floor = np.percentile(psd, 20)  # 底部20%作为噪音基准
-            snr = psd / (noise_floor + 1e-10)
+            noise_floor = np.percentile(power, 20)  # 底部20%作为噪音基准
+            snr = power / (noise_floor + 1e-10)
             
             # 维纳增益
             wiener_gain = snr / (snr + 1 / strength)
             
             # 在频域应用滤波
-            audio_fft = fft.rfft(audio)
-            freq_bins = fft.rfftfreq(len(audio), d=1/sr)
-            
-            # 插值获得每个频率bin的增益
-            gain_interp = np.interp(freq_bins, freqs, wiener_gain)
-            filtered_fft = audio_fft * gain_interp
+            audio_fft *= wiener_gain
             
-            cleaned = fft.irfft(filtered_fft, n=len(audio))
+            cleaned = fft.irfft(audio_fft, n=n_fast, workers=-1)[:len(audio)]
             
             return cleaned
             
@@ -331,15 +376,17 @@ class NoiseRemover:
             high_freq_mask = freqs > 4000
             high_freq_power = np.abs(stft[high_freq_mask, :]) ** 2
             
-            # 计算动态阈值
-            high_freq_median = np.median(high_freq_power, axis=0)
+            if high_freq_power.shape[0] == 0:
+                return audio
+            
+            # 计算动态阈值 (partition 选取中位数，避免逐帧完整排序)
+            k = high_freq_power.shape[0] // 2
+            high_freq_median = np.partition(high_freq_power, k, axis=0)[k, :]
             threshold = high_freq_median * (2 - strength)  # 强度越高，阈值越低
             
-            # 应用门限
-            for i, freq_idx in enumerate(np.where(high_freq_mask)[0]):
-                power = np.abs(stft[freq_idx, :]) ** 2
-                gain = np.where(power > threshold, 1.0, 1 - strength * 0.8)
-                stft[freq_idx, :] *= gain
+            # 应用门限 (复用已计算的高频功率，一次性处理所有高频 bin)
+            gain = np.where(high_freq_power > threshold, 1.0, 1 - strength * 0.8)
+            stft[high_freq_mask, :] *= gain
             
             # 逆变换
             _, cleaned = signal.istft(stft, sr, nperseg=1024)
@@ -405,9 +452,13 @@ class NoiseRemover:
             quality = 30 * strength  # Q因子
             
             if freq < nyquist:
-                # 使用兼容性更好的方式创建陷波滤波器
-                b, a = signal.iirnotch(freq / nyquist, quality)
-                cleaned = signal.filtfilt(b, a, audio)
+                # 转换为二阶节形式，数值更稳定，且同一参数只设计一次
+                key = (sr, freq, quality)
+                sos = self._notch_sos_cache.get(key)
+                if sos is None:
+                    sos = signal.tf2sos(*signal.iirnotch(freq / nyquist, quality))
+                    self._notch_sos_cache[key] = sos
+                cleaned = signal.sosfiltfilt(sos, audio)
                 return cleaned
             else:
                 return audio
@@ -425,22 +476,23 @@ class NoiseRemover:
             left = audio[:, 0]
             right = audio[:, 1]
             
-            # 计算相关性
-            correlation = np.corrcoef(left, right)[0, 1] if len(left) > 1 else 0
+            # 计算相关性 (点积公式，避免 np.corrcoef 的中心化副本和协方差矩阵)
+            correlation = self._channel_correlation(left, right) if len(left) > 1 else 0
             
             if correlation > 0.5:  # 高相关性时增强一致性
                 # 中央成分
-                mid = (left + right) / 2
-                # 侧成分
-                side_left = left - mid
-                side_right = right - mid
+                mid = left + right
+                mid *= 0.5
                 
-                # 减少非相关噪音
+                # 减少非相关噪音: mid + (x - mid) * gain
                 gain = 1 - strength
-                enhanced_left = mid + side_left * gain
-                enhanced_right = mid + side_right * gain
+                enhanced = np.empty_like(audio)
+                np.subtract(left, mid, out=enhanced[:, 0])
+                np.subtract(right, mid, out=enhanced[:, 1])
+                enhanced *= gain
+                enhanced += mid[:, np.newaxis]
                 
-                return np.column_stack([enhanced_left, enhanced_right])
+                return enhanced
             
             return audio
             
@@ -448,21 +500,33 @@ class NoiseRemover:
             logger.warning(f"立体声相关性增强失败: {e}")
             return audio
     
+    def _channel_correlation(self, left: np.ndarray, right: np.ndarray) -> float:
+        """计算左右声道的皮尔逊相关系数"""
+        n = len(left)
+        left_mean = left.mean()
+        right_mean = right.mean()
+        
+        # einsum 融合乘加，不产生中间数组
+        cross = np.einsum('i,i->', left, right) / n - left_mean * right_mean
+        denominator = left.std() * right.std() + 1e-12
+        
+        return float(cross / denominator)
+    
     def _smooth_audio(self, audio: np.ndarray, sr: int) -> np.ndarray:
         """平滑音频，移除突变"""
         try:
-            # 轻微的低通滤波平滑
-            cutoff = sr * 0.4  # 40%奈奎斯特频率
-            nyquist = sr / 2
+            if len(audio) == 0:
+                return audio
             
-            if cutoff < nyquist:
-                sos = signal.butter(2, cutoff / nyquist, btype='low', output='sos')
-                smoothed = signal.sosfilt(sos, audio)
-                
-                # 与原音频混合 (95%处理后 + 5%原音频保持细节)
-                return 0.95 * smoothed + 0.05 * audio
+            # 轻微的低通滤波平滑，以首个采样初始化滤波器状态避免起始瞬态
+            zi = self._smooth_zi * audio[0]
+            smoothed, _ = signal.sosfilt(self._smooth_sos, audio, zi=zi)
             
-            return audio
+            # 与原音频混合 (95%处理后 + 5%原音频保持细节)
+            smoothed *= 0.95
+            smoothed += 0.05 * audio
+            
+            return smoothed
             
         except Exception as e:
             logger.warning(f"音频平滑失败: {e}")
@@ -471,9 +535,11 @@ class NoiseRemover:
     def _calculate_noise_reduction(self, original: np.ndarray, cleaned: np.ndarray) -> float:
         """计算噪音减少量 (dB)"""
         try:
-            # 简单的能量对比
-            original_energy = np.mean(original ** 2)
-            cleaned_energy = np.mean(cleaned ** 2)
+            # 简单的能量对比 (点积求平方和，不分配平方后的临时数组)
+            original_flat = original.ravel()
+            cleaned_flat = cleaned.ravel()
+            original_energy = float(np.dot(original_flat, original_flat)) / original_flat.size
+            cleaned_energy = float(np.dot(cleaned_flat, cleaned_flat)) / cleaned_flat.size
             
             if original_energy > 0 and cleaned_energy > 0:
                 ratio = original_energy / cleaned_energy
@@ -490,11 +556,11 @@ class NoiseRemover:
         try:
             logger.info(f"移除分离伪影: vocals={vocals_path}, accompaniment={accompaniment_path}, 强度={strength}")
             
-            # 处理人声轨道
-            vocals_result = await self.remove_noise(vocals_path, "auto", strength)
-            
-            # 处理伴奏轨道 
-            accompaniment_result = await self.remove_noise(accompaniment_path, "auto", strength)
+            # 人声轨道和伴奏轨道相互独立，并行处理
+            vocals_result, accompaniment_result = await asyncio.gather(
+                self.remove_noise(vocals_path, "auto", strength),
+                self.remove_noise(accompaniment_path, "auto", strength)
+            )
             
             if vocals_result["success"] and accompaniment_result["success"]:
                 return {
@@ -5,11 +5,16 @@
 """
 
 import os
+import hashlib
 import logging
+import threading
 import numpy as np
 import librosa
 import soundfile as sf
+from scipy import signal, ndimage
+import scipy.fft as sfft
 from typing import Optional, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
 
 try:
@@ -19,6 +24,19 @@ except ImportError:
     PYWORLD_AVAILABLE = False
     logging.warning("PyWorld未安装，将使用备用音色保持算法")
 
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+from ._kernels import (
+    NUMBA_AVAILABLE,
+    _blend_log_envelope,
+    _blend_linear_clip,
+    _apply_freq_weight
+)
+
 logger = logging.getLogger(__name__)
 
 class PitchPreservingProcessor:
@@ -30,6 +48,30 @@ class PitchPreservingProcessor:
         self.frame_period = 5.0  # ms
         self.f0_floor = 71.0  # Hz
         self.f0_ceil = 800.0  # Hz
+        self.n_fft = 2048
+        self.hop_length = 512
+        
+        # 可复用的输出缓冲区按线程保存（处理器由单例共享，可能被多个线程并发调用）
+        self._local = threading.local()
+        
+        # 特征提取结果缓存（按音频内容摘要，FIFO淘汰）
+        self._feature_cache: Dict[tuple, Dict[str, np.ndarray]] = {}
+        self._feature_cache_size = 4
+        
+        # 长音频分块处理参数（秒）
+        self.block_threshold = 30.0
+        self.block_duration = 10.0
+        self.block_overlap = 0.05
+        
+        # 光谱重心调整用的对数频率轴（按频点数缓存）
+        self._log_freq_axis: Dict[int, np.ndarray] = {}
+        
+        # MFCC调整用的mel滤波器组（按 (sr, n_fft, n_mels) 缓存）
+        self._mel_cache: Dict[tuple, np.ndarray] = {}
+        self._adj_weights: Optional[np.ndarray] = None
+        
+        # librosa 特征提取线程池（按需创建）
+        self._feature_pool: Optional[ThreadPoolExecutor] = None
         
         # 检查依赖
         self.use_world = PYWORLD_AVAILABLE
@@ -38,40 +80,67 @@ class PitchPreservingProcessor:
         else:
             logger.info("使用librosa备用算法进行音色保持")
     
-    def extract_voice_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
+    def extract_voice_features(
+        self,
+        audio: np.ndarray,
+        include_world: Optional[bool] = None
+    ) -> Dict[str, np.ndarray]:
         """
         提取音色特征
         
         Args:
             audio: 音频数据
+            include_world: 是否提取WORLD特征（默认跟随 use_world）
             
         Returns:
             特征字典
         """
+        if include_world is None:
+            include_world = self.use_world
+        include_world = include_world and PYWORLD_AVAILABLE
+        
+        # 相同内容的音频特征只提取一次（WORLD 分析代价很高）
+        cache_key = self._feature_cache_key(audio) + (include_world,)
+        cached = self._feature_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             features = {}
             
-            if self.use_world:
+            if include_world:
                 # 使用WORLD声码器提取特征
                 features.update(self._extract_world_features(audio))
             
             # 使用librosa提取补充特征
             features.update(self._extract_librosa_features(audio))
             
-            return features
-            
         except Exception as e:
             logger.error(f"特征提取失败: {e}")
             # 降级到基础特征
-            return self._extract_basic_features(audio)
+            features = self._extract_basic_features(audio)
+        
+        self._feature_cache[cache_key] = features
+        if len(self._feature_cache) > self._feature_cache_size:
+            self._feature_cache.pop(next(iter(self._feature_cache)))
+        
+        return features
+    
+    def _feature_cache_key(self, audio: np.ndarray) -> tuple:
+        """特征缓存键：形状、类型及完整数据的摘要
+        
+        不使用缓冲区地址或局部采样：原地修改的数组和复用同一地址的新数组都必须重新提取
+        """
+        digest = hashlib.blake2b(np.ascontiguousarray(audio).data, digest_size=16).digest()
+        return (audio.shape, audio.dtype.str, digest)
     
     def _extract_world_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
         """使用WORLD声码器提取特征"""
         features = {}
         
         try:
-            # 确保音频为double类型
-            audio = audio.astype(np.float64)
+            # 确保音频为C连续的double类型（已满足时不复制）
+            audio = self._world_array(audio)
             
             # 基频提取
             f0, time_axis = pw.harvest(
@@ -82,8 +151,13 @@ class PitchPreservingProcessor:
                 f0_ceil=self.f0_ceil
             )
             
+            f0 = self._world_array(f0)
+            time_axis = self._world_array(time_axis)
+            
             # 精确基频提取
-            f0_refined = pw.stonemask(audio, f0, time_axis, self.sample_rate)
+            f0_refined = self._world_array(
+                pw.stonemask(audio, f0, time_axis, self.sample_rate)
+            )
             
             # 频谱包络提取
             sp = pw.cheaptrick(audio, f0_refined, time_axis, self.sample_rate)
@@ -105,50 +179,69 @@ class PitchPreservingProcessor:
             
         return features
     
+    def _world_buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        """获取当前线程中指定形状的可复用float64缓冲区视图（C连续，内容未初始化）"""
+        size = int(np.prod(shape))
+        buffers = getattr(self._local, 'world_buffers', None)
+        if buffers is None:
+            buffers = self._local.world_buffers = {}
+        buf = buffers.get(name)
+        if buf is None or buf.size < size:
+            buf = np.empty(size, dtype=np.float64)
+            buffers[name] = buf
+        return buf[:size].reshape(shape)
+    
+    @staticmethod
+    def _world_array(x: np.ndarray) -> np.ndarray:
+        """转换为WORLD C扩展所需的C连续float64数组（已满足时不复制）"""
+        return np.ascontiguousarray(x, dtype=np.float64)
+    
     def _extract_librosa_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
         """使用librosa提取特征"""
         features = {}
         
         try:
-            # 基频跟踪
-            pitches, magnitudes = librosa.piptrack(
-                y=audio, 
-                sr=self.sample_rate,
-                threshold=0.1,
-                fmin=self.f0_floor,
-                fmax=self.f0_ceil
-            )
-            
-            # 提取主要基频
-            f0_librosa = []
-            for i in range(pitches.shape[1]):
-                index = magnitudes[:, i].argmax()
-                pitch = pitches[index, i]
-                f0_librosa.append(pitch if pitch > 0 else 0)
-            
-            # 光谱特征
-            spectral_centroid = librosa.feature.spectral_centroid(y=audio, sr=self.sample_rate)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=self.sample_rate)
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=self.sample_rate)
-            
-            # MFCC特征
-            mfcc = librosa.feature.mfcc(y=audio, sr=self.sample_rate, n_mfcc=13)
-            
-            # 色度特征
-            chroma = librosa.feature.chroma_stft(y=audio, sr=self.sample_rate)
-            
-            # 声音特征
-            zcr = librosa.feature.zero_crossing_rate(audio)
-            
-            features.update({
-                'librosa_f0': np.array(f0_librosa),
-                'spectral_centroid': spectral_centroid,
-                'spectral_rolloff': spectral_rolloff,
-                'spectral_bandwidth': spectral_bandwidth,
-                'mfcc': mfcc,
-                'chroma': chroma,
-                'zcr': zcr
-            })
+            # librosa 路径统一使用 float32，WORLD 路径单独转换为 float64
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            
+            # 只计算一次STFT，幅度谱/功率谱在各项特征间共享
+            magnitude = np.abs(self._stft(audio))
+            power = magnitude ** 2
+            
+            # 各项特征相互独立，提交到线程池并行计算 (numpy/scipy 内部释放 GIL)
+            tasks = {
+                # 基频跟踪
+                'piptrack': (librosa.piptrack, {
+                    'S': magnitude,
+                    'sr': self.sample_rate,
+                    'threshold': 0.1,
+                    'fmin': self.f0_floor,
+                    'fmax': self.f0_ceil
+                }),
+                # 光谱特征
+                'spectral_centroid': (librosa.feature.spectral_centroid, {'S': magnitude, 'sr': self.sample_rate}),
+                'spectral_rolloff': (librosa.feature.spectral_rolloff, {'S': magnitude, 'sr': self.sample_rate}),
+                'spectral_bandwidth': (librosa.feature.spectral_bandwidth, {'S': magnitude, 'sr': self.sample_rate}),
+                # MFCC特征
+                'mfcc': (self._mfcc_from_power, {'power': power}),
+                # 色度特征
+                'chroma': (librosa.feature.chroma_stft, {'S': power, 'sr': self.sample_rate}),
+                # 声音特征
+                'zcr': (librosa.feature.zero_crossing_rate, {'y': audio})
+            }
+            
+            pool = self._get_feature_pool()
+            futures = {name: pool.submit(fn, **kwargs) for name, (fn, kwargs) in tasks.items()}
+            results = {name: future.result() for name, future in futures.items()}
+            
+            # 提取主要基频 (每帧取幅度最大的频点，向量化替代逐帧循环)
+            pitches, magnitudes = results.pop('piptrack')
+            index = np.argmax(magnitudes, axis=0)
+            f0_librosa = np.take_along_axis(pitches, index[np.newaxis, :], axis=0)[0]
+            np.maximum(f0_librosa, 0, out=f0_librosa)
+            
+            features['librosa_f0'] = f0_librosa
+            features.update(results)
             
             logger.debug("Librosa特征提取完成")
             
@@ -157,13 +250,24 @@ class PitchPreservingProcessor:
             
         return features
     
+    def _mfcc_from_power(self, power: np.ndarray) -> np.ndarray:
+        """由功率谱计算MFCC（跳过librosa内部的STFT）"""
+        mel_spectrogram = librosa.feature.melspectrogram(S=power, sr=self.sample_rate)
+        return librosa.feature.mfcc(S=librosa.power_to_db(mel_spectrogram), n_mfcc=13)
+    
+    def _get_feature_pool(self) -> ThreadPoolExecutor:
+        """获取特征提取线程池"""
+        if self._feature_pool is None:
+            self._feature_pool = ThreadPoolExecutor(max_workers=4)
+        return self._feature_pool
+    
     def _extract_basic_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
         """提取基础特征（降级方案）"""
         features = {}
         
         try:
             # 简单的频谱分析
-            stft = librosa.stft(audio)
+            stft = self._stft(audio)
             magnitude = np.abs(stft)
             phase = np.angle(stft)
             
@@ -177,11 +281,34 @@ class PitchPreservingProcessor:
             
         return features
     
+    def _stft(self, audio: np.ndarray) -> np.ndarray:
+        """
+        计算complex64 STFT，结果写入当前线程的缓冲区
+        
+        返回值是缓冲区的视图，在本线程下一次调用前有效，调用方不应长期持有；
+        各线程使用各自的缓冲区，并发调用互不覆盖
+        """
+        n_frames = 1 + len(audio) // self.hop_length
+        stft_buf = getattr(self._local, 'stft_buf', None)
+        if stft_buf is None or stft_buf.shape[1] < n_frames:
+            stft_buf = np.empty((1 + self.n_fft // 2, n_frames), dtype=np.complex64)
+            self._local.stft_buf = stft_buf
+        
+        with sfft.set_workers(-1):
+            return librosa.stft(
+                audio,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                dtype=np.complex64,
+                out=stft_buf
+            )
+    
     def transfer_voice_characteristics(
         self,
         source_audio: np.ndarray,
         target_audio: np.ndarray,
-        preservation_strength: float = 0.8
+        preservation_strength: float = 0.8,
+        source_features: Optional[Dict[str, np.ndarray]] = None
     ) -> np.ndarray:
         """
         音色特征转移
@@ -190,6 +317,7 @@ class PitchPreservingProcessor:
             source_audio: 源音频（提供音色特征）
             target_audio: 目标音频（需要应用音色）
             preservation_strength: 保持强度 (0.0-1.0)
+            source_features: 已提取的源音频特征（可选，避免重复提取）
             
         Returns:
             处理后的音频
@@ -197,18 +325,18 @@ class PitchPreservingProcessor:
         try:
             logger.info(f"开始音色特征转移，保持强度: {preservation_strength}")
             
-            # 提取特征
-            source_features = self.extract_voice_features(source_audio)
-            target_features = self.extract_voice_features(target_audio)
+            # 强度为0时输出即目标音频，跳过特征提取与重合成
+            if preservation_strength <= 1e-6:
+                return target_audio.copy()
             
-            # 应用音色转移
-            if self.use_world and 'world_f0' in source_features:
-                processed_audio = self._world_voice_transfer(
-                    source_features, target_features, target_audio, preservation_strength
+            if len(target_audio) > self.block_threshold * self.sample_rate:
+                # 长音频分块处理，限制频谱包络/STFT等中间数组的内存占用
+                processed_audio = self._blockwise_voice_transfer(
+                    source_audio, target_audio, preservation_strength
                 )
             else:
-                processed_audio = self._librosa_voice_transfer(
-                    source_features, target_features, target_audio, preservation_strength
+                processed_audio = self._transfer_voice_block(
+                    source_audio, target_audio, preservation_strength, source_features
                 )
             
             logger.info("音色特征转移完成")
@@ -218,6 +346,87 @@ class PitchPreservingProcessor:
             logger.error(f"音色特征转移失败: {e}")
             return target_audio
     
+    def _transfer_voice_block(
+        self,
+        source_audio: np.ndarray,
+        target_audio: np.ndarray,
+        strength: float,
+        source_features: Optional[Dict[str, np.ndarray]] = None
+    ) -> np.ndarray:
+        """对一段音频进行音色特征转移"""
+        # 提取特征（WORLD路径所需特征在此一次性提取，下游不再重复分析）
+        if source_features is None:
+            source_features = self.extract_voice_features(
+                source_audio, include_world=self.use_world
+            )
+        target_features = self.extract_voice_features(
+            target_audio, include_world=self.use_world
+        )
+        
+        # 应用音色转移
+        if (self.use_world and 'world_f0' in source_features
+                and 'world_f0' in target_features):
+            return self._world_voice_transfer(
+                source_features, target_features, target_audio, strength
+            )
+        
+        return self._librosa_voice_transfer(
+            source_features, target_features, target_audio, strength
+        )
+    
+    def _iter_blocks(self, length: int):
+        """生成带重叠的分块区间 (start, end)"""
+        block = int(self.block_duration * self.sample_rate)
+        hop = block - int(self.block_overlap * self.sample_rate)
+        
+        start = 0
+        while True:
+            end = min(start + block, length)
+            yield start, end
+            if end >= length:
+                break
+            start += hop
+    
+    def _blockwise_voice_transfer(
+        self,
+        source_audio: np.ndarray,
+        target_audio: np.ndarray,
+        strength: float
+    ) -> np.ndarray:
+        """分块音色转移，块间以Hann交叉淡化做重叠相加"""
+        overlap = int(self.block_overlap * self.sample_rate)
+        fade_in = np.sin(np.linspace(0, np.pi / 2, overlap, dtype=np.float32)) ** 2
+        fade_out = 1 - fade_in
+        
+        output = np.zeros(len(target_audio), dtype=np.float32)
+        
+        for start, end in self._iter_blocks(len(target_audio)):
+            block_length = end - start
+            
+            # 源音频取相同位置的片段，长度不足时取末尾片段
+            source_block = source_audio[start:end]
+            if len(source_block) < block_length // 2:
+                source_block = source_audio[-block_length:]
+            
+            processed = self._transfer_voice_block(
+                source_block, target_audio[start:end], strength
+            )
+            
+            # 合成结果长度可能与输入略有差异，对齐到块长度
+            processed = librosa.util.fix_length(
+                np.asarray(processed, dtype=np.float32), size=block_length
+            )
+            
+            fade = min(overlap, block_length)
+            if start > 0:
+                processed[:fade] *= fade_in[:fade]
+            if end < len(target_audio):
+                processed[-fade:] *= fade_out[-fade:]
+            
+            output[start:end] += processed
+        
+        return output
+    
     def _world_voice_transfer(
         self,
         source_features: Dict[str, np.ndarray],
@@ -227,38 +436,43 @@ class PitchPreservingProcessor:
     ) -> np.ndarray:
         """使用WORLD进行音色转移"""
         try:
-            # 获取目标音频的WORLD特征
-            if 'world_f0' not in target_features:
-                target_features = self.extract_voice_features(target_audio)
+            source_sp, target_sp = source_features['world_sp'], target_features['world_sp']
+            source_ap, target_ap = source_features['world_ap'], target_features['world_ap']
+            
+            # 混合结果写入复用缓冲区，合成后即不再使用
+            sp_frames = min(source_sp.shape[0], target_sp.shape[0])
+            ap_frames = min(source_ap.shape[0], target_ap.shape[0])
             
             # 混合频谱包络
             mixed_sp = self._blend_spectral_envelope(
-                source_features['world_sp'],
-                target_features['world_sp'],
-                strength
+                source_sp,
+                target_sp,
+                strength,
+                out=self._world_buffer('sp', (sp_frames,) + target_sp.shape[1:])
             )
             
             # 混合非周期性参数
             mixed_ap = self._blend_aperiodic_parameters(
-                source_features['world_ap'],
-                target_features['world_ap'],
-                strength
+                source_ap,
+                target_ap,
+                strength,
+                out=self._world_buffer('ap', (ap_frames,) + target_ap.shape[1:])
             )
             
             # 保持目标的基频信息
             target_f0 = target_features['world_f0']
             target_time_axis = target_features['world_time_axis']
             
-            # 重合成音频
+            # 重合成音频（C扩展要求C连续的float64输入，提前转换避免内部复制）
             synthesized = pw.synthesize(
-                target_f0,
-                mixed_sp,
-                mixed_ap,
+                self._world_array(target_f0),
+                self._world_array(mixed_sp),
+                self._world_array(mixed_ap),
                 self.sample_rate,
                 frame_period=self.frame_period
             )
             
-            return synthesized.astype(np.float32)
+            return np.asarray(synthesized, dtype=np.float32)
             
         except Exception as e:
             logger.error(f"WORLD音色转移失败: {e}")
@@ -273,10 +487,11 @@ class PitchPreservingProcessor:
     ) -> np.ndarray:
         """使用librosa进行音色转移"""
         try:
+            target_audio = np.ascontiguousarray(target_audio, dtype=np.float32)
+            
             # 频谱域处理
-            target_stft = librosa.stft(target_audio)
+            target_stft = self._stft(target_audio)
             target_magnitude = np.abs(target_stft)
-            target_phase = np.angle(target_stft)
             
             # 应用音色特征
             modified_magnitude = self._apply_timbre_modification(
@@ -286,9 +501,16 @@ class PitchPreservingProcessor:
                 strength
             )
             
-            # 重构音频
-            modified_stft = modified_magnitude * np.exp(1j * target_phase)
-            processed_audio = librosa.istft(modified_stft)
+            # 重构音频：按幅度比例缩放复数谱，相位保持不变，无需 angle/exp
+            if modified_magnitude is not target_magnitude:
+                # 之后不再需要原始幅度，缩放比例直接写回调整结果缓冲区
+                target_magnitude += 1e-12
+                scale = np.divide(modified_magnitude, target_magnitude, out=modified_magnitude)
+                np.multiply(target_stft, scale, out=target_stft)
+            with sfft.set_workers(-1):
+                processed_audio = librosa.istft(
+                    target_stft, n_fft=self.n_fft, hop_length=self.hop_length
+                )
             
             return processed_audio
             
@@ -300,24 +522,43 @@ class PitchPreservingProcessor:
         self,
         source_sp: np.ndarray,
         target_sp: np.ndarray,
-        strength: float
+        strength: float,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
-        """混合频谱包络"""
+        """混合频谱包络（可选写入预分配的 out）"""
         try:
             # 调整长度
             min_frames = min(source_sp.shape[0], target_sp.shape[0])
             source_sp = source_sp[:min_frames]
             target_sp = target_sp[:min_frames]
             
+            if strength == 0:
+                return target_sp
+            
+            # 对数域线性插值，等价于几何加权: t^(1-s) * src^s
+            if NUMBA_AVAILABLE:
+                # Numba 并行内核，单遍写入输出数组
+                if out is None:
+                    out = np.empty(target_sp.shape, dtype=np.result_type(source_sp, target_sp))
+                return _blend_log_envelope(source_sp, target_sp, strength, out)
+            
+            if NUMEXPR_AVAILABLE:
+                # numexpr 单遍分块计算，不物化中间数组
+                return np.ascontiguousarray(ne.evaluate(
+                    "(target_sp + 1e-10) ** (1 - strength) * (source_sp + 1e-10) ** strength",
+                    local_dict={'target_sp': target_sp, 'source_sp': source_sp, 'strength': strength},
+                    out=out
+                ))
+            
             # 对数域混合
             log_source = np.log(source_sp + 1e-10)
             log_target = np.log(target_sp + 1e-10)
             
             # 线性插值
             mixed_log = (1 - strength) * log_target + strength * log_source
-            mixed_sp = np.exp(mixed_log)
+            mixed_sp = np.exp(mixed_log, out=out)
             
-            return mixed_sp
+            return np.ascontiguousarray(mixed_sp)
             
         except Exception as e:
             logger.error(f"频谱包络混合失败: {e}")
@@ -327,20 +568,35 @@ class PitchPreservingProcessor:
         self,
         source_ap: np.ndarray,
         target_ap: np.ndarray,
-        strength: float
+        strength: float,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
-        """混合非周期性参数"""
+        """混合非周期性参数（可选写入预分配的 out）"""
         try:
             # 调整长度
             min_frames = min(source_ap.shape[0], target_ap.shape[0])
             source_ap = source_ap[:min_frames]
             target_ap = target_ap[:min_frames]
             
+            if NUMBA_AVAILABLE:
+                if out is None:
+                    out = np.empty(target_ap.shape, dtype=np.result_type(source_ap, target_ap))
+                return _blend_linear_clip(source_ap, target_ap, strength, 0.001, 0.999, out)
+            
+            if NUMEXPR_AVAILABLE:
+                # 混合与限幅在同一遍中完成（混合项在寄存器内重复计算，不回写内存）
+                mix = "((1 - strength) * target_ap + strength * source_ap)"
+                return ne.evaluate(
+                    f"where({mix} < 0.001, 0.001, where({mix} > 0.999, 0.999, {mix}))",
+                    local_dict={'target_ap': target_ap, 'source_ap': source_ap, 'strength': strength},
+                    out=out
+                )
+            
             # 线性插值混合
             mixed_ap = (1 - strength) * target_ap + strength * source_ap
             
             # 限制范围
-            mixed_ap = np.clip(mixed_ap, 0.001, 0.999)
+            mixed_ap = np.clip(mixed_ap, 0.001, 0.999, out=out)
             
             return mixed_ap
             
@@ -355,9 +611,15 @@ class PitchPreservingProcessor:
         target_features: Dict[str, np.ndarray],
         strength: float
     ) -> np.ndarray:
-        """应用音色修改"""
+        """
+        应用音色修改
+        
+        target_magnitude 不会被修改；各项调整写入同一个输出缓冲区。
+        未做任何调整时直接返回 target_magnitude 本身。
+        """
         try:
-            modified_magnitude = target_magnitude.copy()
+            modified_magnitude = target_magnitude
+            out = np.empty_like(target_magnitude)
             
             # 应用光谱重心调整
             if 'spectral_centroid' in source_features and 'spectral_centroid' in target_features:
@@ -365,7 +627,8 @@ class PitchPreservingProcessor:
                     modified_magnitude,
                     source_features['spectral_centroid'],
                     target_features['spectral_centroid'],
-                    strength
+                    strength,
+                    out=out
                 )
             
             # 应用MFCC调整
@@ -374,7 +637,8 @@ class PitchPreservingProcessor:
                     modified_magnitude,
                     source_features['mfcc'],
                     target_features['mfcc'],
-                    strength
+                    strength,
+                    out=out
                 )
             
             return modified_magnitude
@@ -388,9 +652,10 @@ class PitchPreservingProcessor:
         magnitude: np.ndarray,
         source_centroid: np.ndarray,
         target_centroid: np.ndarray,
-        strength: float
+        strength: float,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
-        """调整光谱重心"""
+        """调整光谱重心（结果写入 out，out 可与 magnitude 相同；无需调整时返回 magnitude）"""
         try:
             # 计算重心差异
             source_mean = np.mean(source_centroid)
@@ -401,16 +666,17 @@ class PitchPreservingProcessor:
                 
                 # 创建频率加权
                 freq_bins = magnitude.shape[0]
-                freq_weights = np.linspace(0.5, 2.0, freq_bins)
+                log_freq_axis = self._get_log_freq_axis(freq_bins)
                 
-                # 应用重心调整
-                adjustment = 1 + (centroid_ratio - 1) * strength * 0.3
-                freq_weights = freq_weights ** adjustment
+                # 应用重心调整 (转为Python标量，避免把权重提升为float64)
+                # w ** a 改写为 exp(a * log(w))，log(w) 已预先缓存
+                adjustment = float(1 + (centroid_ratio - 1) * strength * 0.3)
+                freq_weights = np.exp(log_freq_axis * adjustment)
                 
                 # 应用权重
-                modified_magnitude = magnitude * freq_weights.reshape(-1, 1)
-                
-                return modified_magnitude
+                if out is None:
+                    out = np.empty_like(magnitude)
+                return _apply_freq_weight(magnitude, freq_weights, out)
             
             return magnitude
             
@@ -418,35 +684,58 @@ class PitchPreservingProcessor:
             logger.error(f"光谱重心调整失败: {e}")
             return magnitude
     
+    def _get_log_freq_axis(self, freq_bins: int) -> np.ndarray:
+        """获取缓存的 log(linspace(0.5, 2.0, freq_bins))"""
+        log_freq_axis = self._log_freq_axis.get(freq_bins)
+        if log_freq_axis is None:
+            log_freq_axis = np.log(np.linspace(0.5, 2.0, freq_bins, dtype=np.float32))
+            self._log_freq_axis[freq_bins] = log_freq_axis
+        return log_freq_axis
+    
+    def _get_mel(self, n_fft: int, n_mels: int = 13) -> np.ndarray:
+        """获取缓存的float32 mel滤波器组"""
+        key = (self.sample_rate, n_fft, n_mels)
+        mel_filters = self._mel_cache.get(key)
+        if mel_filters is None:
+            mel_filters = librosa.filters.mel(
+                sr=self.sample_rate, n_fft=n_fft, n_mels=n_mels, dtype=np.float32
+            )
+            self._mel_cache[key] = mel_filters
+        return mel_filters
+    
     def _adjust_with_mfcc(
         self,
         magnitude: np.ndarray,
         source_mfcc: np.ndarray,
         target_mfcc: np.ndarray,
-        strength: float
+        strength: float,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
-        """基于MFCC进行调整"""
+        """基于MFCC进行调整（结果写入 out，out 可与 magnitude 相同）"""
         try:
             # 计算MFCC差异
             mfcc_diff = np.mean(source_mfcc, axis=1) - np.mean(target_mfcc, axis=1)
             
             # 创建频率滤波器
             freq_bins = magnitude.shape[0]
-            mel_filters = librosa.filters.mel(sr=self.sample_rate, n_fft=2*freq_bins-2, n_mels=13)
-            
-            # 计算调整权重
-            adjustment_weights = np.ones(freq_bins)
-            
-            for i, diff in enumerate(mfcc_diff[:min(13, len(mfcc_diff))]):
-                # 将MFCC差异映射到频率权重
-                weight_factor = 1 + diff * strength * 0.1
-                mel_weight = mel_filters[i] * weight_factor
-                adjustment_weights += mel_weight[:freq_bins]
+            mel_filters = self._get_mel(2*freq_bins-2)
+            
+            # 计算调整权重: 1 + Σ mel_filters[i] * (1 + diff[i] * strength * 0.1)
+            # 将MFCC差异映射到频率权重，一次矩阵-向量乘法完成累加
+            k = min(13, len(mfcc_diff))
+            weight_factors = (1 + mfcc_diff[:k] * (strength * 0.1)).astype(np.float32)
+            # 结果写入复用缓冲区后原地加1，不再分配临时数组
+            if self._adj_weights is None or self._adj_weights.shape != (freq_bins,):
+                self._adj_weights = np.empty(freq_bins, dtype=np.float32)
+            adjustment_weights = np.dot(
+                mel_filters[:k, :freq_bins].T, weight_factors, out=self._adj_weights
+            )
+            adjustment_weights += 1.0
             
             # 应用调整
-            modified_magnitude = magnitude * adjustment_weights.reshape(-1, 1)
-            
-            return modified_magnitude
+            if out is None:
+                out = np.empty_like(magnitude)
+            return _apply_freq_weight(magnitude, adjustment_weights, out)
             
         except Exception as e:
             logger.error(f"MFCC调整失败: {e}")
@@ -482,30 +771,37 @@ class PitchPreservingProcessor:
     def _world_pitch_shift(self, audio: np.ndarray, semitones: float) -> np.ndarray:
         """使用WORLD进行音高调整"""
         try:
-            # 确保音频为double类型
-            audio = audio.astype(np.float64)
+            # 确保音频为C连续的double类型（已满足时不复制）
+            audio = self._world_array(audio)
             
             # 提取WORLD特征
             f0, time_axis = pw.harvest(
                 audio, self.sample_rate, frame_period=self.frame_period
             )
-            f0 = pw.stonemask(audio, f0, time_axis, self.sample_rate)
+            f0 = self._world_array(f0)
+            time_axis = self._world_array(time_axis)
+            f0 = self._world_array(pw.stonemask(audio, f0, time_axis, self.sample_rate))
             sp = pw.cheaptrick(audio, f0, time_axis, self.sample_rate)
             ap = pw.d4c(audio, f0, time_axis, self.sample_rate)
             
             # 计算音高比例
             pitch_ratio = 2 ** (semitones / 12.0)
             
-            # 调整基频
-            modified_f0 = f0 * pitch_ratio
-            modified_f0 = np.clip(modified_f0, self.f0_floor, self.f0_ceil)
+            # 调整基频（写入复用缓冲区）
+            modified_f0 = self._world_buffer('f0', f0.shape)
+            np.multiply(f0, pitch_ratio, out=modified_f0)
+            np.clip(modified_f0, self.f0_floor, self.f0_ceil, out=modified_f0)
             
             # 重合成（保持共振峰）
             synthesized = pw.synthesize(
-                modified_f0, sp, ap, self.sample_rate, frame_period=self.frame_period
+                self._world_array(modified_f0),
+                self._world_array(sp),
+                self._world_array(ap),
+                self.sample_rate,
+                frame_period=self.frame_period
             )
             
-            return synthesized.astype(np.float32)
+            return np.asarray(synthesized, dtype=np.float32)
             
         except Exception as e:
             logger.error(f"WORLD音高调整失败: {e}")
@@ -520,20 +816,13 @@ class PitchPreservingProcessor:
         """使用librosa进行音高调整"""
         try:
             if preserve_formants:
-                # 提取原始音色特征
-                original_features = self.extract_voice_features(audio)
-                
                 # 进行音高调整
                 shifted = librosa.effects.pitch_shift(
                     audio, sr=self.sample_rate, n_steps=semitones
                 )
                 
-                # 恢复音色特征
-                processed = self.transfer_voice_characteristics(
-                    audio, shifted, preservation_strength=0.7
-                )
-                
-                return processed
+                # 在STFT域恢复原始频谱包络（共振峰），无需再做完整的特征提取和音色转移
+                return self._restore_spectral_envelope(audio, shifted)
             else:
                 # 简单音高调整
                 return librosa.effects.pitch_shift(
@@ -544,6 +833,49 @@ class PitchPreservingProcessor:
             logger.error(f"Librosa音高调整失败: {e}")
             return audio
     
+    def _restore_spectral_envelope(self, reference: np.ndarray, audio: np.ndarray) -> np.ndarray:
+        """将音频的平均频谱包络校正为参考音频的包络"""
+        try:
+            reference_envelope = self._spectral_envelope(np.abs(self._stft(reference)))
+            
+            audio_stft = self._stft(audio)
+            audio_envelope = self._spectral_envelope(np.abs(audio_stft))
+            
+            # 包络比例作为每个频点的增益，限制范围避免放大噪声
+            gain = reference_envelope / (audio_envelope + 1e-12)
+            gain = np.clip(gain, 0.25, 4.0).astype(np.float32)
+            audio_stft *= gain[:, np.newaxis]
+            
+            with sfft.set_workers(-1):
+                return librosa.istft(
+                    audio_stft, n_fft=self.n_fft, hop_length=self.hop_length, length=len(audio)
+                )
+            
+        except Exception as e:
+            logger.error(f"频谱包络恢复失败: {e}")
+            return audio
+    
+    def _spectral_envelope(self, magnitude: np.ndarray) -> np.ndarray:
+        """时间平均幅度谱在Bark刻度上经Savitzky-Golay平滑后的频谱包络
+        
+        线性频率上的固定窗口会抹平低频的第一共振峰、在高频又平滑不足；
+        先插值到均匀的Bark网格再平滑，窗口宽度随临界频带变化，最后映射回线性频点
+        """
+        spectrum = magnitude.mean(axis=1)
+        freqs = np.linspace(0, self.sample_rate / 2, len(spectrum))
+        bark = self._hz_to_bark(freqs)
+        bark_grid = np.linspace(bark[0], bark[-1], len(spectrum))
+        
+        warped = np.interp(bark_grid, bark, spectrum)
+        smoothed = signal.savgol_filter(warped, 31, 3)
+        envelope = np.interp(bark, bark_grid, smoothed)
+        return np.maximum(envelope, 0)
+    
+    @staticmethod
+    def _hz_to_bark(freqs: np.ndarray) -> np.ndarray:
+        """频率(Hz)转换为Bark刻度（Zwicker公式）"""
+        return 13.0 * np.arctan(0.00076 * freqs) + 3.5 * np.arctan((freqs / 7500.0) ** 2)
+    
     def time_stretch_with_voice_preservation(
         self,
         audio: np.ndarray,
@@ -574,23 +906,32 @@ class PitchPreservingProcessor:
     def _world_time_stretch(self, audio: np.ndarray, rate: float) -> np.ndarray:
         """使用WORLD进行时间拉伸"""
         try:
-            # 简单的时间轴重采样方法
-            # 在实际应用中可以使用更复杂的WORLD时间拉伸算法
+            # 在WORLD参数域直接重采样时间轴：基频、频谱包络和非周期性参数
+            # 沿帧轴插值后重合成，音高与音色天然保持，无需再做相位声码器和音色转移
             
             # 提取特征
-            features = self.extract_voice_features(audio)
+            features = self.extract_voice_features(audio, include_world=True)
             
             # 时间轴调整
             if 'world_time_axis' in features:
-                new_length = int(len(audio) / rate)
-                stretched = librosa.effects.time_stretch(audio, rate=rate)
+                f0 = features['world_f0']
+                new_frames = max(1, int(round(f0.size / rate)))
+                zoom = new_frames / f0.size
+                
+                # 基频用最近邻插值，避免在清浊音边界产生虚假的中间频率
+                stretched_f0 = ndimage.zoom(f0, zoom, order=0)
+                stretched_sp = ndimage.zoom(features['world_sp'], (zoom, 1), order=1)
+                stretched_ap = ndimage.zoom(features['world_ap'], (zoom, 1), order=1)
+                
+                synthesized = pw.synthesize(
+                    self._world_array(stretched_f0),
+                    self._world_array(stretched_sp),
+                    self._world_array(stretched_ap),
+                    self.sample_rate,
+                    frame_period=self.frame_period
+                )
                 
-                # 应用音色保持
-                if len(stretched) != len(audio):
-                    processed = self.transfer_voice_characteristics(
-                        audio, stretched, preservation_strength=0.8
-                    )
-                    return processed
+                return np.asarray(synthesized, dtype=np.float32)
             
             return librosa.effects.time_stretch(audio, rate=rate)
             
@@ -615,7 +956,8 @@ class PitchPreservingProcessor:
                 
                 # 恢复音色特征
                 processed = self.transfer_voice_characteristics(
-                    audio, stretched, preservation_strength=0.6
+                    audio, stretched, preservation_strength=0.6,
+                    source_features=original_features
                 )
                 
                 return processed
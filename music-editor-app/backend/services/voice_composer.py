@@ -6,25 +6,77 @@
 
 import os
 import logging
+import threading
 import numpy as np
 import librosa
 import soundfile as sf
+import scipy.fft as sfft
+from scipy import signal
 from typing import Optional, Dict, Any, Tuple
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from .pitch_preserving_processor import PitchPreservingProcessor
+from ._kernels import _apply_freq_weight
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+try:
+    import pyrubberband as pyrb
+    PYRUBBERBAND_AVAILABLE = True
+except ImportError:
+    PYRUBBERBAND_AVAILABLE = False
+
+try:
+    import soxr
+    SOXR_AVAILABLE = True
+except ImportError:
+    SOXR_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# 写出音频时每次转换和写入的采样数
+WRITE_BLOCK_SIZE = 65536
+
 class VoiceComposer:
     """音色保持音频合成器"""
     
     def __init__(self):
         """初始化音色合成器"""
         self.sample_rate = 22050
+        # STFT 参数：22050Hz 下约46ms窗长，对语音/演唱已足够，FFT 代价约为 2048 点的一半
+        self.n_fft = 1024
+        self.hop_length = 256
         self.pitch_processor = PitchPreservingProcessor()
+        
+        # STFT 窗函数缓存（按 n_fft，float32，跨调用复用）
+        self._stft_windows: Dict[int, np.ndarray] = {}
+        
+        # 特征提取用的mel滤波器组和频点频率（按 n_fft 缓存，float32）
+        self._mel_bases: Dict[int, np.ndarray] = {}
+        self._fft_freqs: Dict[int, np.ndarray] = {}
+        
+        # 混音输出缓冲区（float32，按需扩容，跨调用复用；混音到写出期间持锁）
+        self._mix_buffer: Optional[np.ndarray] = None
+        self._mix_lock = threading.Lock()
         self._ready = True
+        
+        # 预热特征提取与频谱加权路径，把首次调用的编译和初始化开销放在启动阶段
+        self._warmup()
         logger.info("音色合成器初始化完成")
     
+    def _warmup(self):
+        """用一秒纯音跑一遍特征提取和频谱调整（触发 Numba 编译、填充窗函数和滤波器组缓存）"""
+        try:
+            dummy = self._generate_sine(440, self.sample_rate, 0.1)
+            features = self._extract_timbre_features(dummy)
+            self._apply_timbre_preservation(dummy, features)
+        except Exception as e:
+            logger.warning(f"音色合成器预热失败: {e}")
+    
     def is_ready(self) -> bool:
         """检查服务是否准备就绪"""
         return self._ready
@@ -96,24 +148,23 @@ class VoiceComposer:
             # 这里应该实现真正的TTS功能
             # 目前作为占位实现，生成简单的音调
             duration = len(text) * 0.1  # 根据文本长度估算时长
-            t = np.linspace(0, duration, int(duration * self.sample_rate))
             
             # 生成简单的正弦波作为占位音频
             frequency = 440  # A4音符
             if pitch_shift != 0.0:
                 frequency *= (2 ** (pitch_shift / 12))
                 
-            audio = np.sin(2 * np.pi * frequency * t) * 0.3
-            
-            # 应用语速调整
+            # 应用语速调整：纯音的保音高时间拉伸等价于直接按拉伸后的时长生成，无需相位声码器
             if tempo_ratio != 1.0 and tempo_ratio > 0:
-                audio = librosa.effects.time_stretch(audio, rate=1/tempo_ratio)
+                duration *= tempo_ratio
+            
+            audio = self._generate_sine(frequency, int(duration * self.sample_rate), 0.3)
             
             # 保存结果
             if output_path is None:
                 output_path = tempfile.mktemp(suffix='.wav')
                 
-            sf.write(output_path, audio, self.sample_rate, format='WAV')
+            self._write_audio(output_path, audio, format='WAV')
             
             logger.info(f"语音合成完成: {output_path}")
             
@@ -135,6 +186,18 @@ class VoiceComposer:
                 'error': error_msg
             }
     
+    def _generate_sine(self, frequency: float, n_samples: int, amplitude: float) -> np.ndarray:
+        """按采样序号生成float32正弦波，numexpr 可用时单遍完成且无中间数组"""
+        audio = np.arange(n_samples, dtype=np.float32)
+        w = np.float32(2 * np.pi * frequency / self.sample_rate)
+        amplitude = np.float32(amplitude)
+        if NUMEXPR_AVAILABLE:
+            return ne.evaluate("sin(w * audio) * amplitude", out=audio, casting='same_kind')
+        audio *= w
+        np.sin(audio, out=audio)
+        audio *= amplitude
+        return audio
+    
     def compose_with_voice_preservation(
         self, 
         vocals_path: str, 
@@ -142,7 +205,8 @@ class VoiceComposer:
         lyrics_audio_path: str,
         output_path: Optional[str] = None,
         pitch_shift: float = 0.0,
-        tempo_ratio: float = 1.0
+        tempo_ratio: float = 1.0,
+        apply_timbre: bool = False
     ) -> Dict[str, Any]:
         """
         使用音色保持技术合成音频
@@ -154,6 +218,7 @@ class VoiceComposer:
             output_path: 输出文件路径
             pitch_shift: 音高调整（半音为单位）
             tempo_ratio: 节拍调整比例
+            apply_timbre: 未调整音高和节拍时是否仍进行音色转移
             
         Returns:
             合成结果信息
@@ -161,34 +226,35 @@ class VoiceComposer:
         try:
             logger.info(f"开始音色保持合成: vocals={vocals_path}, instrumental={instrumental_path}")
             
-            # 加载音频文件
-            vocals, sr1 = librosa.load(vocals_path, sr=self.sample_rate)
-            instrumental, sr2 = librosa.load(instrumental_path, sr=self.sample_rate)
-            lyrics_audio, sr3 = librosa.load(lyrics_audio_path, sr=self.sample_rate)
+            # 加载音频文件（解码时释放GIL，三个文件并行读取）
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                vocals, instrumental, lyrics_audio = executor.map(
+                    self._load_audio,
+                    (vocals_path, instrumental_path, lyrics_audio_path)
+                )
             
             # 音色保持处理
             processed_vocals = self._preserve_voice_timbre(
                 original_vocals=vocals,
                 new_lyrics_audio=lyrics_audio,
                 pitch_shift=pitch_shift,
-                tempo_ratio=tempo_ratio
+                tempo_ratio=tempo_ratio,
+                apply_timbre=apply_timbre
             )
             
-            # 合成最终音频
-            final_audio = self._mix_audio(processed_vocals, instrumental)
-            
             # 保存结果
             if output_path is None:
                 output_path = tempfile.mktemp(suffix='.wav')
             
-            sf.write(output_path, final_audio, self.sample_rate)
+            # 合成最终音频并写出
+            duration = self._mix_and_write(processed_vocals, instrumental, output_path)
             
             logger.info(f"音色保持合成完成: {output_path}")
             
             return {
                 'success': True,
                 'output_path': output_path,
-                'duration': len(final_audio) / self.sample_rate,
+                'duration': duration,
                 'sample_rate': self.sample_rate,
                 'message': '音色保持合成成功'
             }
@@ -201,12 +267,49 @@ class VoiceComposer:
                 'error': error_msg
             }
     
+    def _load_audio(self, path: str) -> np.ndarray:
+        """
+        加载为合成采样率的单声道float32音频
+        
+        直接用 soundfile 读取，先混为单声道再按需重采样；
+        soundfile 不支持的格式退回 librosa.load
+        """
+        try:
+            audio, sr = sf.read(path, dtype='float32', always_2d=False)
+        except Exception as e:
+            logger.debug(f"soundfile 无法读取 {path}，改用 librosa: {e}")
+            audio, _ = librosa.load(path, sr=self.sample_rate)
+            return audio
+        
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1, dtype=np.float32)
+        
+        # 采样率一致时不做任何重采样；否则直接调用 soxr（与 librosa 默认的 soxr_hq 相同）
+        if sr != self.sample_rate:
+            if SOXR_AVAILABLE:
+                audio = soxr.resample(audio, sr, self.sample_rate, quality='HQ')
+            else:
+                audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sample_rate)
+        return audio
+    
+    def _write_audio(self, path: str, audio: np.ndarray, format: Optional[str] = None):
+        """
+        分块写出单声道音频
+        
+        每块单独转换为float32后交给 libsndfile 量化（WAV 默认 PCM_16），
+        不为整段音频生成转换副本
+        """
+        with sf.SoundFile(path, 'w', self.sample_rate, channels=1, format=format) as out:
+            for start in range(0, len(audio), WRITE_BLOCK_SIZE):
+                out.write(np.asarray(audio[start:start + WRITE_BLOCK_SIZE], dtype=np.float32))
+    
     def _preserve_voice_timbre(
         self, 
         original_vocals: np.ndarray,
         new_lyrics_audio: np.ndarray,
         pitch_shift: float = 0.0,
-        tempo_ratio: float = 1.0
+        tempo_ratio: float = 1.0,
+        apply_timbre: bool = False
     ) -> np.ndarray:
         """
         保持原始音色特征的音频处理
@@ -216,32 +319,27 @@ class VoiceComposer:
             new_lyrics_audio: 新歌词音频
             pitch_shift: 音高调整
             tempo_ratio: 节拍调整
+            apply_timbre: 未调整音高和节拍时是否仍进行音色转移
             
         Returns:
             处理后的音频
         """
+        # 未请求任何调整时直接返回，跳过代价很高的音色转移
+        if pitch_shift == 0.0 and tempo_ratio == 1.0 and not apply_timbre:
+            return new_lyrics_audio
+        
         try:
-            # 提取原始音色特征
-            original_features = self._extract_timbre_features(original_vocals)
-            
+            # 原始音色特征由 transfer_voice_characteristics 自行提取（带缓存），这里无需单独提取
             # 使用新的音高保持处理器进行高级处理
             processed_audio = new_lyrics_audio
             
             # 应用时间拉伸（保持音高）
             if tempo_ratio != 1.0:
-                processed_audio = self.pitch_processor.time_stretch_with_voice_preservation(
-                    processed_audio, 
-                    rate=tempo_ratio,
-                    preserve_pitch=True
-                )
+                processed_audio = self._time_stretch(processed_audio, tempo_ratio)
             
             # 应用音高调整（保持音色）
             if pitch_shift != 0.0:
-                processed_audio = self.pitch_processor.pitch_shift_with_voice_preservation(
-                    processed_audio,
-                    semitones=pitch_shift,
-                    preserve_formants=True
-                )
+                processed_audio = self._pitch_shift(processed_audio, pitch_shift)
             
             # 应用音色特征转移
             processed_audio = self.pitch_processor.transfer_voice_characteristics(
@@ -257,6 +355,40 @@ class VoiceComposer:
             # 降级处理：返回调整后的新音频
             return new_lyrics_audio
     
+    def _time_stretch(self, audio: np.ndarray, rate: float) -> np.ndarray:
+        """保持音高的时间拉伸，优先使用 rubberband 原生实现"""
+        if PYRUBBERBAND_AVAILABLE:
+            try:
+                return pyrb.time_stretch(audio, self.sample_rate, rate).astype(np.float32)
+            except Exception as e:
+                logger.debug(f"rubberband 时间拉伸失败，使用音高保持处理器: {e}")
+        return self.pitch_processor.time_stretch_with_voice_preservation(
+            audio,
+            rate=rate,
+            preserve_pitch=True
+        )
+    
+    def _pitch_shift(self, audio: np.ndarray, semitones: float) -> np.ndarray:
+        """
+        保持共振峰的音高调整
+        
+        WORLD 可用时由音高保持处理器完成（单独保留频谱包络）；
+        否则优先使用 rubberband（--formant 模式），替代 librosa 相位声码器
+        """
+        if PYRUBBERBAND_AVAILABLE and not self.pitch_processor.use_world:
+            try:
+                # --formant: rubberband 单独保留频谱包络，与 WORLD 路径一样不移动共振峰
+                return pyrb.pitch_shift(
+                    audio, self.sample_rate, semitones, rbargs={'--formant': ''}
+                ).astype(np.float32)
+            except Exception as e:
+                logger.debug(f"rubberband 音高调整失败，使用音高保持处理器: {e}")
+        return self.pitch_processor.pitch_shift_with_voice_preservation(
+            audio,
+            semitones=semitones,
+            preserve_formants=True
+        )
+    
     def _extract_timbre_features(self, audio: np.ndarray) -> Dict[str, np.ndarray]:
         """
         提取音色特征
@@ -269,9 +401,26 @@ class VoiceComposer:
         """
         features = {}
         
-        # 提取MFCC特征（音色特征）
+        # 全程使用float32/complex64
+        audio = np.asarray(audio, dtype=np.float32)
+        
+        # 所有特征共用一次STFT
+        window = self._get_stft_window(self.n_fft)
+        with sfft.set_workers(-1):
+            magnitude = np.abs(librosa.stft(
+                audio,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                window=window,
+                dtype=np.complex64
+            ))
+        power = magnitude ** 2
+        freqs = self._get_fft_freqs(self.n_fft)
+        
+        # 提取MFCC特征（音色特征），mel投影为单精度矩阵乘法
+        mel_spec = np.dot(self._get_mel_basis(self.n_fft), power)
         mfcc = librosa.feature.mfcc(
-            y=audio, 
+            S=librosa.power_to_db(mel_spec),
             sr=self.sample_rate,
             n_mfcc=13
         )
@@ -279,21 +428,23 @@ class VoiceComposer:
         
         # 提取光谱质心
         spectral_centroid = librosa.feature.spectral_centroid(
-            y=audio,
-            sr=self.sample_rate
+            S=magnitude,
+            sr=self.sample_rate,
+            freq=freqs
         )
         features['spectral_centroid'] = spectral_centroid
         
         # 提取光谱滚降
         spectral_rolloff = librosa.feature.spectral_rolloff(
-            y=audio,
-            sr=self.sample_rate
+            S=magnitude,
+            sr=self.sample_rate,
+            freq=freqs
         )
         features['spectral_rolloff'] = spectral_rolloff
         
         # 提取色度特征
         chroma = librosa.feature.chroma_stft(
-            y=audio,
+            S=power,
             sr=self.sample_rate
         )
         features['chroma'] = chroma
@@ -316,8 +467,16 @@ class VoiceComposer:
             处理后的音频
         """
         try:
-            # 使用librosa的相位保持重构
-            stft = librosa.stft(target_audio)
+            # 使用librosa的相位保持重构（复用缓存的窗函数，FFT 由 scipy.fft 多线程执行）
+            window = self._get_stft_window(self.n_fft)
+            with sfft.set_workers(-1):
+                stft = librosa.stft(
+                    np.asarray(target_audio, dtype=np.float32),
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                    window=window,
+                    dtype=np.complex64
+                )
             
             # 获取幅度和相位
             magnitude = np.abs(stft)
@@ -330,9 +489,15 @@ class VoiceComposer:
                 source_features
             )
             
-            # 重构音频
-            processed_stft = processed_magnitude * np.exp(1j * phase)
-            processed_audio = librosa.istft(processed_stft)
+            # 重构音频：极坐标转直角坐标，实部和虚部直接写回 stft 缓冲区（不生成complex128临时数组）
+            processed_stft = self._polar_to_complex(processed_magnitude, phase, out=stft)
+            with sfft.set_workers(-1):
+                processed_audio = librosa.istft(
+                    processed_stft,
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                    window=window
+                )
             
             return processed_audio
             
@@ -340,6 +505,43 @@ class VoiceComposer:
             logger.error(f"音色保持应用失败: {str(e)}")
             return target_audio
     
+    @staticmethod
+    def _polar_to_complex(magnitude: np.ndarray, phase: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """out = magnitude * exp(1j * phase)，分别写入 out 的实部和虚部"""
+        if NUMEXPR_AVAILABLE:
+            ne.evaluate("magnitude * cos(phase)", out=out.real, casting='same_kind')
+            ne.evaluate("magnitude * sin(phase)", out=out.imag, casting='same_kind')
+        else:
+            np.cos(phase, out=out.real)
+            out.real *= magnitude
+            np.sin(phase, out=out.imag)
+            out.imag *= magnitude
+        return out
+    
+    def _get_stft_window(self, n_fft: int) -> np.ndarray:
+        """获取缓存的float32 Hann窗（与librosa默认的周期Hann窗一致）"""
+        window = self._stft_windows.get(n_fft)
+        if window is None:
+            window = signal.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+            self._stft_windows[n_fft] = window
+        return window
+    
+    def _get_mel_basis(self, n_fft: int) -> np.ndarray:
+        """获取缓存的float32 mel滤波器组（librosa默认的128个mel带）"""
+        mel_basis = self._mel_bases.get(n_fft)
+        if mel_basis is None:
+            mel_basis = librosa.filters.mel(sr=self.sample_rate, n_fft=n_fft, dtype=np.float32)
+            self._mel_bases[n_fft] = mel_basis
+        return mel_basis
+    
+    def _get_fft_freqs(self, n_fft: int) -> np.ndarray:
+        """获取缓存的float32 STFT频点频率"""
+        freqs = self._fft_freqs.get(n_fft)
+        if freqs is None:
+            freqs = librosa.fft_frequencies(sr=self.sample_rate, n_fft=n_fft).astype(np.float32)
+            self._fft_freqs[n_fft] = freqs
+        return freqs
+    
     def _adjust_magnitude_with_timbre(
         self, 
         magnitude: np.ndarray, 
@@ -363,17 +565,13 @@ class VoiceComposer:
             centroid_mean = np.mean(source_features['spectral_centroid'])
             freq_bins = magnitude.shape[0]
             
-            # 创建频率权重
-            freq_weights = np.linspace(0.5, 1.5, freq_bins)
-            
-            # 调整权重以匹配音色特征
+            # 创建频率权重，并调整权重以匹配音色特征（只涉及 freq_bins 个元素）
             adjustment_factor = centroid_mean / (self.sample_rate / 4)
-            freq_weights = freq_weights * adjustment_factor
+            freq_weights = np.linspace(0.5, 1.5, freq_bins, dtype=np.float32)
+            freq_weights *= np.float32(adjustment_factor)
             
-            # 应用权重
-            adjusted_magnitude = magnitude * freq_weights.reshape(-1, 1)
-            
-            return adjusted_magnitude
+            # 应用权重（并行内核单遍写出，不生成广播临时数组）
+            return _apply_freq_weight(magnitude, freq_weights, np.empty_like(magnitude))
         
         return magnitude
     
@@ -382,7 +580,8 @@ class VoiceComposer:
         vocals: np.ndarray, 
         instrumental: np.ndarray,
         vocal_volume: float = 1.0,
-        instrumental_volume: float = 0.8
+        instrumental_volume: float = 0.8,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
         """
         混合人声和伴奏
@@ -392,6 +591,7 @@ class VoiceComposer:
             instrumental: 伴奏音频
             vocal_volume: 人声音量
             instrumental_volume: 伴奏音量
+            out: 可选的float32输出缓冲区（长度不小于较短的输入）
             
         Returns:
             混合后的音频
@@ -400,21 +600,60 @@ class VoiceComposer:
         min_length = min(len(vocals), len(instrumental))
         vocals = vocals[:min_length]
         instrumental = instrumental[:min_length]
+        vv = np.float32(vocal_volume)
+        iv = np.float32(instrumental_volume)
+        if out is None:
+            out = np.empty(min_length, dtype=np.float32)
+        mixed_audio = out[:min_length]
         
-        # 音量调整
-        vocals = vocals * vocal_volume
-        instrumental = instrumental * instrumental_volume
+        # 音量调整与混合（输出为float32，不修改输入数组）
+        if NUMEXPR_AVAILABLE:
+            vocals = np.ascontiguousarray(vocals, dtype=np.float32)
+            instrumental = np.ascontiguousarray(instrumental, dtype=np.float32)
+            ne.evaluate("vocals * vv + instrumental * iv", out=mixed_audio)
+        else:
+            # 类型转换与缩放在同一次 ufunc 中完成，伴奏缩放后原地累加
+            np.multiply(vocals, vv, out=mixed_audio, casting='same_kind')
+            scaled = np.multiply(instrumental, iv, dtype=np.float32)
+            np.add(mixed_audio, scaled, out=mixed_audio)
         
-        # 混合
-        mixed_audio = vocals + instrumental
+        if mixed_audio.size == 0:
+            return mixed_audio
         
-        # 防止削波
-        max_val = np.max(np.abs(mixed_audio))
+        # 防止削波（峰值由最值得出，缩放原地完成）
+        max_val = float(max(mixed_audio.max(), -mixed_audio.min()))
         if max_val > 0.95:
-            mixed_audio = mixed_audio * (0.95 / max_val)
+            mixed_audio *= np.float32(0.95 / max_val)
         
         return mixed_audio
     
+    def _get_mix_buffer(self, length: int) -> np.ndarray:
+        """获取长度不小于 length 的混音缓冲区（调用方需持有 _mix_lock）"""
+        if self._mix_buffer is None or self._mix_buffer.size < length:
+            self._mix_buffer = np.empty(length, dtype=np.float32)
+        return self._mix_buffer
+    
+    def _mix_and_write(
+        self,
+        vocals: np.ndarray,
+        instrumental: np.ndarray,
+        output_path: str,
+        vocal_volume: float = 1.0,
+        instrumental_volume: float = 0.8
+    ) -> float:
+        """在复用的缓冲区中混音并写出，返回输出时长（秒）"""
+        min_length = min(len(vocals), len(instrumental))
+        with self._mix_lock:
+            final_audio = self._mix_audio(
+                vocals,
+                instrumental,
+                vocal_volume,
+                instrumental_volume,
+                out=self._get_mix_buffer(min_length)
+            )
+            self._write_audio(output_path, final_audio)
+        return len(final_audio) / self.sample_rate
+    
     def simple_compose(
         self,
         vocals_path: str,
@@ -438,29 +677,28 @@ class VoiceComposer:
         """
         try:
             # 加载音频文件
-            vocals, sr1 = librosa.load(vocals_path, sr=self.sample_rate)
-            instrumental, sr2 = librosa.load(instrumental_path, sr=self.sample_rate)
+            vocals = self._load_audio(vocals_path)
+            instrumental = self._load_audio(instrumental_path)
             
-            # 简单混合
-            final_audio = self._mix_audio(
+            # 保存结果
+            if output_path is None:
+                output_path = tempfile.mktemp(suffix='.wav')
+            
+            # 简单混合并写出
+            duration = self._mix_and_write(
                 vocals, 
                 instrumental, 
+                output_path,
                 vocal_volume, 
                 instrumental_volume
             )
             
-            # 保存结果
-            if output_path is None:
-                output_path = tempfile.mktemp(suffix='.wav')
-            
-            sf.write(output_path, final_audio, self.sample_rate)
-            
             logger.info(f"简单音频合成完成: {output_path}")
             
             return {
                 'success': True,
                 'output_path': output_path,
-                'duration': len(final_audio) / self.sample_rate,
+                'duration': duration,
                 'sample_rate': self.sample_rate,
                 'message': '音频合成成功'
             }
@@ -473,9 +711,15 @@ class VoiceComposer:
                 'error': error_msg
             }
 
-# 全局实例
-voice_composer = VoiceComposer()
+# 全局实例（首次使用时创建，避免导入模块即初始化处理器）
+_voice_composer: Optional[VoiceComposer] = None
+_voice_composer_lock = threading.Lock()
 
 def get_voice_composer() -> VoiceComposer:
     """获取音色合成器实例"""
-    return voice_composer
+    global _voice_composer
+    if _voice_composer is None:
+        with _voice_composer_lock:
+            if _voice_composer is None:
+                _voice_composer = VoiceComposer()
+    return _voice_composer
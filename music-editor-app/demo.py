@@ -4,37 +4,47 @@
 展示基本功能和API调用
 """
 
-import requests
+import asyncio
+import httpx
 import json
 import time
 
-def test_api():
+async def test_api():
     """测试API功能"""
     base_url = "http://localhost:8000"
     
     print("🎵 智能音乐编辑器演示")
     print("=" * 50)
     
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        # 健康检查和根路径互不依赖，并发请求
+        health_result, root_result = await asyncio.gather(
+            client.get("/health"),
+            client.get("/"),
+            return_exceptions=True
+        )
+    
     # 1. 健康检查
     print("\n1. 检查后端服务状态...")
-    try:
-        response = requests.get(f"{base_url}/health")
-        health_data = response.json()
-        print(f"✅ 后端服务状态: {health_data['status']}")
-        
-        for service, status in health_data['services'].items():
-            status_icon = "✅" if status else "⚠️"
-            print(f"   {status_icon} {service}: {'就绪' if status else '需要安装依赖'}")
-            
-    except requests.exceptions.ConnectionError:
+    if isinstance(health_result, httpx.ConnectError):
         print("❌ 无法连接到后端服务，请确保服务器正在运行")
         return
+    if isinstance(health_result, Exception):
+        raise health_result
+    
+    health_data = health_result.json()
+    print(f"✅ 后端服务状态: {health_data['status']}")
+    
+    for service, status in health_data['services'].items():
+        status_icon = "✅" if status else "⚠️"
+        print(f"   {status_icon} {service}: {'就绪' if status else '需要安装依赖'}")
     
     # 2. 测试根路径
     print("\n2. 测试API根路径...")
     try:
-        response = requests.get(f"{base_url}/")
-        data = response.json()
+        if isinstance(root_result, Exception):
+            raise root_result
+        data = root_result.json()
         print(f"✅ {data['message']}")
     except Exception as e:
         print(f"❌ API测试失败: {e}")
@@ -80,7 +90,7 @@ music-editor-app/
     print(structure)
 
 if __name__ == "__main__":
-    test_api()
+    asyncio.run(test_api())
     show_project_structure()
     
     print("\n🚀 快速启动:")
@@ -5,12 +5,14 @@
 测试音频分离、歌词提取等功能
 """
 
-import requests
+import asyncio
+import httpx
 import json
-import time
 import os
 
-def test_audio_upload():
+BASE_URL = "http://127.0.0.1:8001"
+
+async def test_audio_upload(client):
     """测试音频文件上传"""
     print("=== 测试音频文件上传 ===")
     
@@ -19,12 +21,12 @@ def test_audio_upload():
         print(f"测试文件不存在: {test_file}")
         return False
     
-    url = "http://127.0.0.1:8001/api/upload-audio"
+    url = "/api/upload-audio"
     
     try:
         with open(test_file, 'rb') as f:
             files = {'file': (os.path.basename(test_file), f, 'audio/mpeg')}
-            response = requests.post(url, files=files)
+            response = await client.post(url, files=files)
         
         if response.status_code == 200:
             result = response.json()
@@ -38,15 +40,15 @@ def test_audio_upload():
         print(f"上传异常: {e}")
         return False
 
-def test_audio_separation(filename):
+async def test_audio_separation(client, filename):
     """测试音频分离"""
     print("=== 测试音频分离 ===")
     
-    url = "http://127.0.0.1:8001/api/separate_audio"
+    url = "/api/separate_audio"
     data = {'filename': filename}
     
     try:
-        response = requests.post(url, json=data)
+        response = await client.post(url, json=data)
         
         if response.status_code == 200:
             result = response.json()
@@ -60,15 +62,15 @@ def test_audio_separation(filename):
         print(f"分离异常: {e}")
         return False
 
-def test_lyrics_extraction(filename):
+async def test_lyrics_extraction(client, filename):
     """测试歌词提取"""
     print("=== 测试歌词提取 ===")
     
-    url = "http://127.0.0.1:8001/api/extract_lyrics"
+    url = "/api/extract_lyrics"
     data = {'filename': filename}
     
     try:
-        response = requests.post(url, json=data)
+        response = await client.post(url, json=data)
         
         if response.status_code == 200:
             result = response.json()
@@ -84,14 +86,14 @@ def test_lyrics_extraction(filename):
         print(f"歌词提取异常: {e}")
         return False
 
-def test_api_health():
+async def test_api_health(client):
     """测试API健康状态"""
     print("=== 测试API健康状态 ===")
     
-    url = "http://127.0.0.1:8001/"
+    url = "/"
     
     try:
-        response = requests.get(url)
+        response = await client.get(url)
         
         if response.status_code == 200:
             result = response.json()
@@ -105,46 +107,48 @@ def test_api_health():
         print(f"连接失败: {e}")
         return False
 
-def main():
+async def main():
     """主测试流程"""
     print("音频处理功能完整测试")
     print("=" * 40)
     
-    # 1. 测试API健康状态
-    if not test_api_health():
-        print("❌ API服务未启动，请先启动后端服务")
-        return
-    
-    # 2. 测试文件上传
-    filename = test_audio_upload()
-    if not filename:
-        print("❌ 文件上传失败")
-        return
-    
-    print(f"✅ 文件上传成功: {filename}")
-    
-    # 等待一下
-    time.sleep(1)
-    
-    # 3. 测试音频分离
-    separation_result = test_audio_separation(filename)
-    if separation_result:
-        print("✅ 音频分离测试成功")
-    else:
-        print("❌ 音频分离测试失败")
-    
-    # 等待一下
-    time.sleep(1)
-    
-    # 4. 测试歌词提取
-    lyrics_result = test_lyrics_extraction(filename)
-    if lyrics_result:
-        print("✅ 歌词提取测试成功")
-    else:
-        print("❌ 歌词提取测试失败")
+    # 各步骤前后依赖，共用一个客户端以复用连接；分离和识别耗时较长，不设超时
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=None) as client:
+        # 1. 测试API健康状态
+        if not await test_api_health(client):
+            print("❌ API服务未启动，请先启动后端服务")
+            return
+        
+        # 2. 测试文件上传
+        filename = await test_audio_upload(client)
+        if not filename:
+            print("❌ 文件上传失败")
+            return
+        
+        print(f"✅ 文件上传成功: {filename}")
+        
+        # 等待一下
+        await asyncio.sleep(1)
+        
+        # 3. 测试音频分离
+        separation_result = await test_audio_separation(client, filename)
+        if separation_result:
+            print("✅ 音频分离测试成功")
+        else:
+            print("❌ 音频分离测试失败")
+        
+        # 等待一下
+        await asyncio.sleep(1)
+        
+        # 4. 测试歌词提取
+        lyrics_result = await test_lyrics_extraction(client, filename)
+        if lyrics_result:
+            print("✅ 歌词提取测试成功")
+        else:
+            print("❌ 歌词提取测试失败")
     
     print("\n" + "=" * 40)
     print("测试完成!")
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
@@ -7,12 +7,48 @@
 import sys
 import os
 import json
+import struct
 import subprocess
 import time
 
 # 添加后端路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
+# 可用时使用 msgpack 二进制编码，否则使用分帧JSON
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+def encode_message(obj):
+    """编码消息体"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj).encode('utf-8')
+
+def decode_message(raw):
+    """解码消息体"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+# 与 ipc_handler 分帧模式一致：4字节小端长度 + 消息体
+FRAME_HEADER = struct.Struct('<I')
+
+def send_frame(stream, payload):
+    """写入一帧并刷新"""
+    stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+def read_frame(stream):
+    """读取一帧，进程输出结束时返回空字节串"""
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return b''
+    (length,) = FRAME_HEADER.unpack(header)
+    return stream.read(length)
+
 def test_ipc_handler():
     """测试IPC处理器"""
     print("=== 测试IPC处理器 ===")
@@ -28,12 +64,14 @@ def test_ipc_handler():
         
         print(f"启动IPC处理器: {python_path} {ipc_script}")
         
+        # 使用长度前缀分帧模式，按二进制读写
+        transport_flag = '--msgpack' if MSGPACK_AVAILABLE else '--framed'
+        print(f"传输模式: {transport_flag}")
         process = subprocess.Popen(
-            [python_path, ipc_script],
+            [python_path, ipc_script, transport_flag],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+            stderr=subprocess.DEVNULL,
             cwd=os.path.dirname(__file__)
         )
         
@@ -48,16 +86,15 @@ def test_ipc_handler():
         }
         
         print("发送测试命令:", json.dumps(test_command))
-        process.stdin.write(json.dumps(test_command) + '\n')
-        process.stdin.flush()
+        send_frame(process.stdin, encode_message(test_command))
         
         # 读取响应
         try:
-            output_line = process.stdout.readline()
-            print(f"收到响应: {output_line.strip()}")
+            output_line = read_frame(process.stdout)
+            print(f"收到响应: {len(output_line)} 字节")
             
-            if output_line.strip():
-                response = json.loads(output_line.strip())
+            if output_line:
+                response = decode_message(output_line)
                 print("解析的响应:", json.dumps(response, indent=2, ensure_ascii=False))
                 
                 if response.get('result', {}).get('success'):
@@ -70,8 +107,8 @@ def test_ipc_handler():
                 print("❌ 没有收到响应")
                 return False
                 
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON解析失败: {e}")
+        except ValueError as e:
+            print(f"❌ 响应解析失败: {e}")
             print(f"原始输出: {output_line}")
             return False
         
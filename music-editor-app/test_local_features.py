@@ -3,132 +3,397 @@
 """
 本地功能测试脚本 - 无需HTTP请求
 直接测试音频处理模块功能
+
+用法:
+    python test_local_features.py                       # 环境检查 + 全部服务测试
+    python test_local_features.py --skip-heavy          # 只做环境和测试文件检查，不初始化服务
+    python test_local_features.py --only=recognizer     # 只测试指定服务（separator,recognizer,processor）
+    python test_local_features.py --warm                # 60秒内已验证就绪的服务直接复用结果，并记录本次结果
+    python test_local_features.py --warm --warm-ttl=300 # 自定义就绪记录的有效期（秒）
+    python test_local_features.py --json                # stdout 只输出 JSON 汇总，文字输出改到 stderr
+
+服务模块在各测试函数内部导入，导入本文件或使用 --skip-heavy 时不会加载模型依赖
 """
 
 import os
 import sys
+import json
+import time
+import argparse
 import asyncio
+import functools
+import itertools
+import contextlib
+import importlib.util
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+# 可选: uvloop 事件循环（任务调度开销更低，Windows 上不可用）
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# 添加backend路径（绝对路径只计算一次；重复导入本文件时不重复添加）
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_BACKEND = os.path.join(_HERE, 'backend')
+if _BACKEND not in sys.path:
+    sys.path.append(_BACKEND)
+
+# 跨进程的就绪记录（--warm 模式使用）: 服务选项名 -> 最近一次验证就绪的时间戳
+CACHE_DIR = os.path.join(_HERE, '.cache')
+WARM_MANIFEST = os.path.join(CACHE_DIR, 'services_ready.json')
+WARM_TTL = 60
+
+# 各服务测试耗时记录（保留最近若干次运行，用于观察趋势）
+TIMINGS_FILE = os.path.join(CACHE_DIR, 'test_timings.json')
+TIMINGS_KEEP = 50
 
-# 添加backend路径
-sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+def _emit(lines):
+    """一次写出一段输出（各段内容先收集到列表，减少写 stdout 的次数）"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+@dataclass
+class TestResult:
+    """单项服务测试结果"""
+    name: str
+    ok: bool
+    ms: Optional[float] = None  # 从开始预热到测试完成的耗时，缓存就绪时为 None
+
+# 服务实例在进程内只创建一次（重复运行测试时复用已加载的模型）
+@functools.lru_cache(maxsize=1)
+def _get_separator():
+    from backend.services.audio_separator import AudioSeparator
+    return AudioSeparator()
+
+@functools.lru_cache(maxsize=1)
+def _get_recognizer():
+    from backend.services.speech_recognizer import SpeechRecognizer
+    return SpeechRecognizer()
+
+@functools.lru_cache(maxsize=1)
+def _get_processor():
+    from backend.services.audio_processor import AudioProcessor
+    return AudioProcessor()
 
 def test_audio_separator():
     """测试音轨分离服务"""
-    print("=== 测试音轨分离服务 ===")
+    # 服务测试并发执行，每个测试的输出整段写出，不会与其他测试交错
+    lines = ["=== 测试音轨分离服务 ==="]
     
     try:
-        from backend.services.audio_separator import AudioSeparator
-        
-        separator = AudioSeparator()
-        print(f"音轨分离服务初始化: {'成功' if separator else '失败'}")
-        print(f"服务状态: {'就绪' if separator.is_ready() else '未就绪'}")
+        separator = _get_separator()
+        lines.append(f"音轨分离服务初始化: {'成功' if separator else '失败'}")
+        lines.append(f"服务状态: {'就绪' if separator.is_ready() else '未就绪'}")
         return True
         
     except Exception as e:
-        print(f"音轨分离服务测试失败: {e}")
+        lines.append(f"音轨分离服务测试失败: {e}")
         return False
+    finally:
+        _emit(lines)
 
 async def test_speech_recognizer():
     """测试语音识别服务"""
-    print("\n=== 测试语音识别服务 ===")
+    lines = ["\n=== 测试语音识别服务 ==="]
     
     try:
-        from backend.services.speech_recognizer import SpeechRecognizer
-        
-        recognizer = SpeechRecognizer()
-        print(f"语音识别服务初始化: {'成功' if recognizer else '失败'}")
-        print(f"服务状态: {'就绪' if recognizer.is_ready() else '未就绪'}")
+        recognizer = _get_recognizer()
+        lines.append(f"语音识别服务初始化: {'成功' if recognizer else '失败'}")
+        lines.append(f"服务状态: {'就绪' if recognizer.is_ready() else '未就绪'}")
         
         if recognizer.is_ready():
             # 测试获取支持的语言
             langs = await recognizer.get_supported_languages()
             if langs.get('success'):
-                print(f"支持的语言数量: {len(langs.get('languages', {}))}")
-                print(f"语言列表: {list(langs.get('languages', {}).keys())[:5]}...")  # 只显示前5个
+                languages = langs.get('languages', {})
+                lines.append(f"支持的语言数量: {len(languages)}")
+                lines.append(f"语言列表: {list(itertools.islice(languages, 5))}...")  # 只显示前5个，不构建完整键列表
             else:
-                print("获取语言列表失败")
+                lines.append("获取语言列表失败")
         
         return True
         
     except Exception as e:
-        print(f"语音识别服务测试失败: {e}")
+        lines.append(f"语音识别服务测试失败: {e}")
         return False
+    finally:
+        _emit(lines)
 
 def test_audio_processor():
     """测试音频处理器"""
-    print("\n=== 测试音频处理器 ===")
+    lines = ["\n=== 测试音频处理器 ==="]
     
     try:
-        from backend.services.audio_processor import AudioProcessor
-        
-        processor = AudioProcessor()
-        print(f"音频处理器初始化: {'成功' if processor else '失败'}")
+        processor = _get_processor()
+        lines.append(f"音频处理器初始化: {'成功' if processor else '失败'}")
         return True
         
     except Exception as e:
-        print(f"音频处理器测试失败: {e}")
+        lines.append(f"音频处理器测试失败: {e}")
         return False
+    finally:
+        _emit(lines)
+
+def _probe_dir(test_dir):
+    """探测单个目录，返回 (目录, 是否存在, 前3个条目名, 条目总数)"""
+    # 直接打开目录，不存在时由异常判断（省去一次 stat，也没有检查与打开之间的竞争）
+    try:
+        # 只保留前3个条目用于显示，其余条目只计数，不构建完整文件名列表
+        with os.scandir(test_dir) as entries:
+            head = [entry.name for entry in itertools.islice(entries, 3)]
+            count = len(head) + sum(1 for _ in entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return test_dir, False, [], 0
+    return test_dir, True, head, count
 
-def check_test_files():
+async def check_test_files():
     """检查测试文件"""
-    print("\n=== 检查测试文件 ===")
+    lines = ["\n=== 检查测试文件 ==="]
     
     test_dirs = ['test_files', 'uploads', 'backend/uploads']
-    for test_dir in test_dirs:
-        if os.path.exists(test_dir):
-            files = os.listdir(test_dir)
-            if files:
-                print(f"{test_dir}/: {len(files)} 个文件")
-                for file in files[:3]:  # 只显示前3个
-                    print(f"  - {file}")
+    # 各目录的文件系统调用在线程中并发执行，结果按原顺序输出
+    probes = await asyncio.gather(*(asyncio.to_thread(_probe_dir, d) for d in test_dirs))
+    for test_dir, exists, head, count in probes:
+        if exists:
+            if head:
+                lines.append(f"{test_dir}/: {count} 个文件")
+                lines.extend(f"  - {file}" for file in head)  # 只显示前3个
             else:
-                print(f"{test_dir}/: 空目录")
+                lines.append(f"{test_dir}/: 空目录")
         else:
-            print(f"{test_dir}/: 不存在")
+            lines.append(f"{test_dir}/: 不存在")
+    _emit(lines)
 
 def check_python_version():
     """检查Python版本"""
-    print("=== Python环境检查 ===")
-    print(f"Python版本: {sys.version}")
-    print(f"Python路径: {sys.executable}")
+    _emit([
+        "=== Python环境检查 ===",
+        f"Python版本: {sys.version}",
+        f"Python路径: {sys.executable}"
+    ])
+
+def _as_success(outcome):
+    """把测试结果（可能是异常）转换为是否成功"""
+    if isinstance(outcome, BaseException):
+        print(f"测试执行异常: {outcome}")
+        return False
+    return bool(outcome)
+
+# 服务测试: 选项名 -> (显示名称, 创建测试协程的函数, 服务实例工厂)
+SERVICE_TESTS = {
+    'separator': ("音轨分离", lambda: asyncio.to_thread(test_audio_separator), _get_separator),
+    'recognizer': ("语音识别", test_speech_recognizer, _get_recognizer),
+    'processor': ("音频处理器", lambda: asyncio.to_thread(test_audio_processor), _get_processor),
+}
+
+def _backend_available():
+    """检查 backend.services 包能否找到（只导入轻量的 backend 包本身，不加载服务模块）"""
+    try:
+        return importlib.util.find_spec('backend.services') is not None
+    except ModuleNotFoundError:
+        return False
+
+def _prewarm(services):
+    """立即在线程池中开始构造服务实例，返回 选项名 -> Future
+    
+    run_in_executor 在调用时就提交任务，随后的同步环境检查期间模型已经在加载
+    """
+    loop = asyncio.get_running_loop()
+    return {service: loop.run_in_executor(None, SERVICE_TESTS[service][2]) for service in services}
 
-async def main():
-    """主测试流程"""
-    print("音频编辑器本地功能测试")
-    print("=" * 50)
+async def _run_service_test(service, warming, started):
+    """等待预热完成后执行服务测试，返回 (测试结果或异常, 耗时毫秒)"""
+    try:
+        await warming
+    except Exception:
+        # 构造失败不在这里报告: 测试函数会再次调用工厂并按原格式输出错误
+        pass
+    try:
+        outcome = await SERVICE_TESTS[service][1]()
+    except Exception as e:
+        outcome = e
+    return outcome, (time.perf_counter() - started) * 1000
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="音频编辑器本地功能测试")
+    parser.add_argument(
+        '--skip-heavy',
+        action='store_true',
+        help="只做环境和测试文件检查，不初始化任何服务"
+    )
+    parser.add_argument(
+        '--warm',
+        action='store_true',
+        help=f"复用有效期内记录为就绪的服务结果，并记录本次结果"
+    )
+    parser.add_argument(
+        '--warm-ttl',
+        type=float,
+        default=WARM_TTL,
+        help=f"就绪记录的有效期（秒），默认 {WARM_TTL}"
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help="在 stdout 输出机器可读的 JSON 汇总，文字输出改写到 stderr"
+    )
+    parser.add_argument(
+        '--only',
+        default=','.join(SERVICE_TESTS),
+        help=f"逗号分隔的服务列表，可选: {','.join(SERVICE_TESTS)}"
+    )
+    args = parser.parse_args(argv)
+    
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in SERVICE_TESTS]
+    if unknown:
+        parser.error(f"未知的服务: {', '.join(unknown)}")
+    args.services = [] if args.skip_heavy else selected
+    return args
+
+def _load_warm_manifest(ttl=WARM_TTL):
+    """读取就绪记录，只返回仍在有效期内的条目（每个服务单独计时）"""
+    try:
+        with open(WARM_MANIFEST, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict):
+        return {}
+    now = time.time()
+    return {
+        service: stamp for service, stamp in manifest.items()
+        if isinstance(stamp, (int, float)) and not isinstance(stamp, bool) and now - stamp < ttl
+    }
+
+def _save_warm_manifest(ready):
+    """写入就绪记录"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(WARM_MANIFEST, 'w', encoding='utf-8') as f:
+            json.dump(ready, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"写入就绪记录失败: {e}")
+
+def _record_timings(results):
+    """把本次各服务耗时追加到耗时记录文件"""
+    timed = {result.name: round(result.ms, 1) for result in results if result.ms is not None}
+    if not timed:
+        return
+    try:
+        with open(TIMINGS_FILE, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = []
+    history.append({'time': time.time(), 'timings': timed})
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(TIMINGS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(history[-TIMINGS_KEEP:], f, ensure_ascii=False)
+    except OSError as e:
+        print(f"写入耗时记录失败: {e}")
+
+async def main(services=None, warm=False, warm_ttl=WARM_TTL):
+    """主测试流程，返回可序列化为 JSON 的结果汇总"""
+    if services is None:
+        services = list(SERVICE_TESTS)
+    
+    # --warm: 最近已验证就绪的服务不再重新初始化
+    cached = _load_warm_manifest(warm_ttl) if warm else {}
+    pending = [service for service in services if service not in cached]
+    
+    # backend 包缺失时直接结束，不再让每个服务测试各自导入失败一次
+    if pending and not _backend_available():
+        _emit([f"backend 未安装: 找不到 backend.services（{_HERE}），跳过全部服务测试"])
+        results = [TestResult(SERVICE_TESTS[service][0], False) for service in services]
+        return {
+            'results': [asdict(result) for result in results],
+            'total': len(results),
+            'passed': 0,
+            'duration_ms': 0.0
+        }
+    
+    # 先开始加载服务，再做下面的同步检查，两者时间重叠；耗时从这里开始计算
+    started = time.perf_counter()
+    warming = _prewarm(pending)
+    
+    _emit(["音频编辑器本地功能测试", "=" * 50])
     
     # Python环境检查
     check_python_version()
     
     # 检查测试文件
-    check_test_files()
-    
-    # 测试各个服务
-    results = []
+    await check_test_files()
     
-    # 1. 测试音轨分离
-    results.append(("音轨分离", test_audio_separator()))
+    skipped = [
+        f"\n{SERVICE_TESTS[service][0]}: 缓存就绪（{time.time() - cached[service]:.0f}秒前已验证，跳过初始化）"
+        for service in services if service not in pending
+    ]
+    if skipped:
+        _emit(skipped)
     
-    # 2. 测试语音识别
-    results.append(("语音识别", await test_speech_recognizer()))
+    # 测试选中的服务（互不依赖，并发执行；实例已在预热中创建，同步测试放到线程中）
+    outcomes = await asyncio.gather(
+        *(_run_service_test(service, warming[service], started) for service in pending),
+        return_exceptions=True
+    )
+    success_by_service = {service: True for service in services if service not in pending}
+    ms_by_service = {}
+    for service, outcome in zip(pending, outcomes):
+        if isinstance(outcome, BaseException):
+            success_by_service[service] = _as_success(outcome)
+        else:
+            success_by_service[service] = _as_success(outcome[0])
+            ms_by_service[service] = outcome[1]
+    results = [
+        TestResult(SERVICE_TESTS[service][0], success_by_service[service], ms_by_service.get(service))
+        for service in services
+    ]
     
-    # 3. 测试音频处理器
-    results.append(("音频处理器", test_audio_processor()))
+    if warm:
+        # 只记录本次验证成功的服务；沿用的记录保留原时间戳，到期后必须重新验证
+        now = time.time()
+        verified = {service: now for service in pending if success_by_service[service]}
+        _save_warm_manifest({**cached, **verified})
     
     # 输出结果
-    print("\n" + "=" * 50)
-    print("测试结果汇总:")
-    for name, success in results:
-        status = "✅ 成功" if success else "❌ 失败"
-        print(f"  {name}: {status}")
+    lines = ["\n" + "=" * 50, "测试结果汇总:"]
+    total_success = 0
+    for result in results:
+        total_success += result.ok
+        status = "✅ 成功" if result.ok else "❌ 失败"
+        timing = f" ({result.ms:.0f}ms)" if result.ms is not None else " (缓存)"
+        lines.append(f"  {result.name}: {status}{timing}")
+    
+    lines.append(f"\n总计: {total_success}/{len(results)} 项测试通过")
+    _emit(lines)
+    
+    _record_timings(results)
     
-    total_success = sum(1 for _, success in results if success)
-    print(f"\n总计: {total_success}/{len(results)} 项测试通过")
+    return {
+        'results': [asdict(result) for result in results],
+        'total': len(results),
+        'passed': total_success,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
 
 if __name__ == '__main__':
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("\n测试被用户中断")
-    except Exception as e:
-        print(f"\n测试执行异常: {e}")
+    args = parse_args()
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    # --json: 所有文字输出（包括服务模块自身的输出）改到 stderr，stdout 只保留 JSON
+    json_out = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        try:
+            summary = asyncio.run(main(args.services, warm=args.warm, warm_ttl=args.warm_ttl))
+            if args.json:
+                json.dump(summary, json_out, ensure_ascii=False)
+                json_out.write("\n")
+        except KeyboardInterrupt:
+            print("\n测试被用户中断")
+        except Exception as e:
+            print(f"\n测试执行异常: {e}")